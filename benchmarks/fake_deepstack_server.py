@@ -0,0 +1,189 @@
+"""
+Local stand-in for the DeepStack server, used by the benchmark.
+
+Answers the vision endpoints with generated predictions after a configurable latency,
+can fail a share of the requests to exercise the error paths.
+
+Run standalone:
+    python benchmarks/fake_deepstack_server.py --port 5000 --latency 50 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENDPOINT_DETECTION = '/v1/vision/detection'
+ENDPOINT_FACE_RECOGNIZE = '/v1/vision/face/recognize'
+ENDPOINT_FACE_REGISTER = '/v1/vision/face/register'
+ENDPOINT_FACE_DELETE = '/v1/vision/face/delete'
+ENDPOINT_FACE_LIST = '/v1/vision/face/list'
+
+DEFAULT_LABELS = ['person', 'car', 'dog']
+DEFAULT_USERS = ['alice', 'bob', 'unknown']
+
+
+class FakeDeepStackSettings:
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, objects=2, faces=1, labels=None, users=None,
+                 width=1920, height=1080):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.objects = objects
+        self.faces = faces
+        self.labels = labels or DEFAULT_LABELS
+        self.users = users or DEFAULT_USERS
+        self.width = width
+        self.height = height
+
+        self.requests = 0
+        self.errors = 0
+        self.received_bytes = 0
+        self.lock = threading.Lock()
+
+
+def create_box(settings):
+    x_min = random.randint(0, settings.width // 2)
+    y_min = random.randint(0, settings.height // 2)
+
+    box = {
+        'x_min': x_min,
+        'y_min': y_min,
+        'x_max': x_min + random.randint(10, settings.width // 2),
+        'y_max': y_min + random.randint(10, settings.height // 2)
+    }
+
+    return box
+
+
+def create_predictions(path, settings):
+    predictions = []
+
+    if path == ENDPOINT_DETECTION:
+        for index in range(settings.objects):
+            prediction = create_box(settings)
+            prediction['label'] = settings.labels[index % len(settings.labels)]
+            prediction['confidence'] = round(random.uniform(0.5, 1), 3)
+
+            predictions.append(prediction)
+
+    elif path == ENDPOINT_FACE_RECOGNIZE:
+        for index in range(settings.faces):
+            prediction = create_box(settings)
+            prediction['userid'] = settings.users[index % len(settings.users)]
+            prediction['confidence'] = round(random.uniform(0.5, 1), 3)
+
+            predictions.append(prediction)
+
+    return predictions
+
+
+def create_handler(settings):
+    class FakeDeepStackHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            content_length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(content_length)
+
+            with settings.lock:
+                settings.requests += 1
+                settings.received_bytes += content_length
+
+            delay = settings.latency + random.uniform(0, settings.jitter)
+
+            if delay > 0:
+                time.sleep(delay)
+
+            if random.random() < settings.error_rate:
+                with settings.lock:
+                    settings.errors += 1
+
+                self._send(500, {'success': False, 'error': 'Simulated failure'})
+
+                return
+
+            if self.path == ENDPOINT_FACE_LIST:
+                data = {'success': True, 'faces': [user for user in settings.users if user != 'unknown']}
+            elif self.path in [ENDPOINT_FACE_REGISTER, ENDPOINT_FACE_DELETE]:
+                data = {'success': True}
+            else:
+                data = {'success': True, 'predictions': create_predictions(self.path, settings)}
+
+            self._send(200, data)
+
+        def _send(self, status, data):
+            body = json.dumps(data).encode()
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, message_format, *args):
+            pass
+
+    return FakeDeepStackHandler
+
+
+class FakeDeepStackServer:
+    """Runs the fake server on a background thread, port 0 picks a free port."""
+
+    def __init__(self, settings, host='127.0.0.1', port=0):
+        self._settings = settings
+        self._server = ThreadingHTTPServer((host, port), create_handler(settings))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def settings(self):
+        return self._settings
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake DeepStack server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=50, help='Response latency in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0, help='Random extra latency up to, in milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests failing with HTTP 500')
+    parser.add_argument('--objects', type=int, default=2, help='Predictions per detection response')
+    parser.add_argument('--faces', type=int, default=1, help='Predictions per recognition response')
+
+    args = parser.parse_args()
+
+    settings = FakeDeepStackSettings(args.latency / 1000, args.jitter / 1000, args.error_rate, args.objects,
+                                     args.faces)
+
+    server = FakeDeepStackServer(settings, args.host, args.port)
+    server.start()
+
+    print(f'Fake DeepStack listening on http://{server.host}:{server.port}')
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
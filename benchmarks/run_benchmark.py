@@ -0,0 +1,354 @@
+"""
+Benchmark of the DeepStack request path against a local fake DeepStack server.
+
+Drives DeepStack.async_detect, DeepStack.async_recognize and the image processors async_process_image on an
+event loop with N simulated cameras (a coroutine per camera), the path the integration runs in Home Assistant.
+Every frame is unique, the images are cycled and a per camera / frame trailer is appended so the frame caches and
+the face index do not answer repeated frames. Reports throughput, tail latency and client CPU per frame.
+Requires Home Assistant to be installed (the integration imports it), the fake server runs in its own process
+so its CPU is not counted.
+
+    python benchmarks/run_benchmark.py --cameras 12 --frames 50 --image a.jpg b.jpg --output results.json
+    python benchmarks/run_benchmark.py --baseline results.json --max-regression 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_deepstack_server import FakeDeepStackServer, FakeDeepStackSettings  # noqa: E402
+
+MODE_DETECT = 'detect'
+MODE_RECOGNIZE = 'recognize'
+MODE_RECOGNIZE_DETECT_FIRST = 'recognize_detect_first'
+MODE_PROCESS_IMAGE = 'process_image'
+
+MODES = [MODE_DETECT, MODE_RECOGNIZE, MODE_RECOGNIZE_DETECT_FIRST, MODE_PROCESS_IMAGE]
+
+COMPARED_METRICS = {
+    'throughput': 1,
+    'p95': -1,
+    'p99': -1,
+    'cpu_ms_per_frame': -1
+}
+
+
+class BenchmarkConfig:
+    """Minimal stand-in of hass.config."""
+
+    def __init__(self, config_dir):
+        self._config_dir = config_dir
+
+    def path(self, *path):
+        return os.path.join(self._config_dir, *path)
+
+    def is_allowed_path(self, path):
+        return True
+
+
+class BenchmarkServices:
+    def register(self, domain, service, service_func, schema=None):
+        pass
+
+
+class BenchmarkBus:
+    def __init__(self):
+        self.events = 0
+        self._stop_listeners = []
+
+    def async_fire(self, event_type, event_data=None):
+        self.events += 1
+
+    def async_listen_once(self, event_type, listener):
+        self._stop_listeners.append(listener)
+
+    async def async_stop(self):
+        """Run the stop listeners (closes the aiohttp sessions of the integration)."""
+        for listener in self._stop_listeners:
+            result = listener(None)
+
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class BenchmarkHass:
+    """Only what the event loop request path of the integration uses."""
+
+    def __init__(self, config_dir):
+        self.config = BenchmarkConfig(config_dir)
+        self.services = BenchmarkServices()
+        self.bus = BenchmarkBus()
+        self.data = {}
+        self.loop = None
+
+    def async_add_job(self, target, *args):
+        result = target(*args)
+
+        if asyncio.iscoroutine(result):
+            return asyncio.ensure_future(result)
+
+        return result
+
+    def async_add_executor_job(self, target, *args):
+        return self.loop.run_in_executor(None, target, *args)
+
+
+def serve(settings, ready_queue):
+    server = FakeDeepStackServer(settings)
+    server.start()
+
+    ready_queue.put(server.port)
+
+    while True:
+        time.sleep(1)
+
+
+def start_server(settings):
+    ready_queue = multiprocessing.Queue()
+
+    process = multiprocessing.Process(target=serve, args=(settings, ready_queue), daemon=True)
+    process.start()
+
+    port = ready_queue.get(timeout=10)
+
+    return process, port
+
+
+def get_percentile(samples, quantile):
+    if len(samples) == 0:
+        return None
+
+    index = min(int(math.ceil(quantile * len(samples))) - 1, len(samples) - 1)
+
+    return samples[max(index, 0)]
+
+
+def get_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL)
+
+        return commit.decode().strip()
+    except Exception:
+        return None
+
+
+def get_frame(images, mode, camera_index, frame_index):
+    """Unique frame of the camera, data after the JPEG end of image marker is ignored by the decoders."""
+    image = images[(camera_index + frame_index) % len(images)]
+    trailer = f'{mode}:{camera_index}:{frame_index}'.encode()
+
+    return image + trailer
+
+
+def create_frame_handler(mode, data, camera_entity_id, camera_name):
+    from custom_components.deepstack.const import TARGET_PERSON
+    from custom_components.deepstack.face_classify_entity import FaceClassifyEntity
+    from custom_components.deepstack.object_classify_entity import ObjectClassifyEntity
+
+    if mode == MODE_DETECT:
+        return lambda image: data.async_detect(image, camera_entity_id, [TARGET_PERSON])
+
+    if mode == MODE_RECOGNIZE:
+        return lambda image: data.async_recognize(image, camera_entity_id, camera_name, False)
+
+    if mode == MODE_RECOGNIZE_DETECT_FIRST:
+        return lambda image: data.async_recognize(image, camera_entity_id, camera_name, True)
+
+    face_entity = FaceClassifyEntity(data.benchmark_hass, data, camera_entity_id, camera_name, False)
+    object_entity = ObjectClassifyEntity(data.benchmark_hass, data, camera_entity_id, camera_name, [TARGET_PERSON])
+
+    async def async_process_image(image):
+        await asyncio.gather(object_entity.async_process_image(image), face_entity.async_process_image(image))
+
+    return async_process_image
+
+
+async def async_run_mode(mode, data, cameras, frames, images):
+    latencies = []
+
+    async def async_run_camera(index):
+        camera_entity_id = f'camera.benchmark_{index}'
+        handler = create_frame_handler(mode, data, camera_entity_id, f'Benchmark {index}')
+
+        for frame_index in range(frames):
+            image = get_frame(images, mode, index, frame_index)
+
+            start_time = time.perf_counter()
+
+            await handler(image)
+
+            latencies.append(time.perf_counter() - start_time)
+
+    cpu_start_time = time.process_time()
+    start_time = time.perf_counter()
+
+    await asyncio.gather(*[async_run_camera(index) for index in range(cameras)])
+
+    elapsed = time.perf_counter() - start_time
+    cpu_time = time.process_time() - cpu_start_time
+
+    latencies.sort()
+
+    total_frames = len(latencies)
+
+    result = {
+        'frames': total_frames,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(total_frames / elapsed, 2),
+        'p50': round(get_percentile(latencies, 0.5) * 1000, 2),
+        'p95': round(get_percentile(latencies, 0.95) * 1000, 2),
+        'p99': round(get_percentile(latencies, 0.99) * 1000, 2),
+        'cpu_ms_per_frame': round(cpu_time / total_frames * 1000, 3)
+    }
+
+    return result
+
+
+async def async_run(config, modes, cameras, frames, images):
+    from custom_components.deepstack.deep_stack import DeepStack
+
+    hass = BenchmarkHass(os.getcwd())
+    hass.loop = asyncio.get_running_loop()
+
+    data = await hass.async_add_executor_job(DeepStack, hass, config)
+    data.benchmark_hass = hass
+
+    for index in range(cameras * 2):
+        data.add_processor(index)
+
+    await data.async_warm_up()
+
+    results = {}
+
+    try:
+        for mode in modes:
+            results[mode] = await async_run_mode(mode, data, cameras, frames, images)
+
+            print(f'{mode:<24} {json.dumps(results[mode])}')
+
+    finally:
+        await hass.bus.async_stop()
+
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """List of regressions above max_regression percent, lower is better except for throughput."""
+    regressions = []
+
+    for mode, mode_results in results.items():
+        baseline_results = baseline.get('results', {}).get(mode)
+
+        if baseline_results is None:
+            continue
+
+        for metric, direction in COMPARED_METRICS.items():
+            current = mode_results.get(metric)
+            previous = baseline_results.get(metric)
+
+            if not current or not previous:
+                continue
+
+            change = (current - previous) / previous * 100
+
+            if change * direction < -max_regression:
+                regressions.append(f'{mode} {metric}: {previous} -> {current} ({change:+.1f}%)')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DeepStack request path benchmark')
+    parser.add_argument('--cameras', type=int, default=12, help='Simulated cameras, a coroutine each')
+    parser.add_argument('--frames', type=int, default=50, help='Frames per camera per mode')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--image', nargs='+', help='JPEG files to cycle, random bytes of --image-size otherwise')
+    parser.add_argument('--image-size', type=int, default=200 * 1024, help='Size of the random image in bytes')
+    parser.add_argument('--latency', type=float, default=50, help='Fake server latency in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0, help='Fake server random extra latency in milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of fake server requests failing')
+    parser.add_argument('--objects', type=int, default=2, help='Predictions per detection response')
+    parser.add_argument('--faces', type=int, default=1, help='Predictions per recognition response')
+    parser.add_argument('--config', help='JSON file with additional deepstack configuration')
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--baseline', help='Results JSON of a previous run to compare with')
+    parser.add_argument('--max-regression', type=float, default=10, help='Allowed regression in percent')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    settings = FakeDeepStackSettings(args.latency / 1000, args.jitter / 1000, args.error_rate, args.objects,
+                                     args.faces)
+
+    server_process, port = start_server(settings)
+
+    try:
+        if args.image:
+            images = []
+
+            for image_path in args.image:
+                with open(image_path, 'rb') as image_file:
+                    images.append(image_file.read())
+        else:
+            images = [os.urandom(args.image_size)]
+
+        config = {
+            'host': '127.0.0.1',
+            'port': port
+        }
+
+        if args.config:
+            with open(args.config) as config_file:
+                config.update(json.load(config_file))
+
+        results = asyncio.run(async_run(config, args.modes, args.cameras, args.frames, images))
+
+    finally:
+        server_process.terminate()
+
+    output = {
+        'commit': get_commit(),
+        'parameters': {
+            'cameras': args.cameras,
+            'frames': args.frames,
+            'images': len(images),
+            'image_size': round(sum(len(image) for image in images) / len(images)),
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'error_rate': args.error_rate
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline, args.max_regression)
+
+        if len(regressions) > 0:
+            print(f'Regressions compared to {baseline.get("commit")}:')
+
+            for regression in regressions:
+                print(f'  {regression}')
+
+            sys.exit(1)
+
+        print(f'No regressions compared to {baseline.get("commit")}')
+
+
+if __name__ == '__main__':
+    main()
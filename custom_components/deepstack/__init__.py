@@ -6,16 +6,22 @@ https://home-assistant.io/components/edgeos/
 from .const import *
 from .deep_stack import (DeepStack)
 from homeassistant.components.camera import DOMAIN as CAMERA_DOMAIN
+from homeassistant.helpers.discovery import async_load_platform
 
 DEPENDENCIES = [CAMERA_DOMAIN]
 
 
-def setup(hass, config):
-    """Set up an Home Automation Manager component."""
+async def async_setup(hass, config):
+    """Set up an Home Automation Manager component, DeepStack is contacted by a background warm up."""
     conf = config.get(DOMAIN, {})
 
-    data = DeepStack(hass, conf)
+    data = await hass.async_add_executor_job(DeepStack, hass, conf)
 
     hass.data[DATA_DEEP_STACK] = data
 
+    await hass.async_add_executor_job(data.start)
+
+    hass.async_create_task(data.async_warm_up())
+    hass.async_create_task(async_load_platform(hass, SENSOR_DOMAIN, DOMAIN, {}, config))
+
     return data.is_initialized
@@ -0,0 +1,77 @@
+import logging
+import threading
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ActivityLog:
+    """Hot path logging, requests are counted per camera and logged as one summary line per camera every interval.
+
+    With trace enabled every request is logged with its result at INFO level, otherwise at DEBUG level.
+    Messages use lazy formatting so results are not formatted when the level is disabled.
+    """
+
+    def __init__(self, interval=LOG_SUMMARY_INTERVAL):
+        self._interval = interval
+        self._trace = False
+        self._requests = {}
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def set_trace(self, enabled):
+        self._trace = enabled
+
+        _LOGGER.info('Request trace %s', 'enabled' if enabled else 'disabled')
+
+    def trace(self, operation, camera_entity_id, result):
+        if self._trace:
+            _LOGGER.info('Trace %s of %s: %s', operation, camera_entity_id, result)
+        else:
+            _LOGGER.debug('%s result of %s: %s', operation, camera_entity_id, result)
+
+    def record(self, camera_entity_id, operation, duration, found):
+        """Count a request of the camera, found is the number of objects / faces in the result."""
+        key = (camera_entity_id, operation)
+
+        with self._lock:
+            requests, total_duration, max_duration, total_found = self._requests.get(key, (0, 0, 0, 0))
+
+            self._requests[key] = (requests + 1, total_duration + duration, max(max_duration, duration),
+                                   total_found + found)
+
+    def record_event(self, camera_entity_id):
+        with self._lock:
+            self._events[camera_entity_id] = self._events.get(camera_entity_id, 0) + 1
+
+    def log_summary(self, event_time=None):
+        """Log the requests and events of every active camera since the previous summary."""
+        with self._lock:
+            requests = self._requests
+            events = self._events
+
+            self._requests = {}
+            self._events = {}
+
+        if not _LOGGER.isEnabledFor(logging.INFO):
+            return
+
+        cameras = set(camera_entity_id for camera_entity_id, operation in requests.keys()) | set(events.keys())
+
+        for camera_entity_id in sorted(cameras, key=str):
+            parts = []
+
+            for operation in [OPERATION_DETECT, OPERATION_RECOGNIZE]:
+                operation_requests = requests.get((camera_entity_id, operation))
+
+                if operation_requests is None:
+                    continue
+
+                count, total_duration, max_duration, total_found = operation_requests
+
+                parts.append('%s: %d requests, %.3fs average, %.3fs max, %d found' %
+                             (operation, count, total_duration / count, max_duration, total_found))
+
+            _LOGGER.info('%s, last %d seconds - %s, %d events', camera_entity_id, self._interval,
+                         '; '.join(parts) or 'no requests', events.get(camera_entity_id, 0))
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Backend:
+    """Single DeepStack server, tracks its connection state and latency."""
+
+    def __init__(self, host, port, ssl):
+        protocol = PROTOCOLS[ssl]
+
+        self._url = f'{protocol}://{host}:{port}'
+
+        self.outstanding = 0
+        self.is_connected = False
+        self.consecutive_failures = 0
+        self.ejected_until = None
+        self.requests = 0
+        self.failures = 0
+        self.average_latency = None
+        self.last_latency = None
+
+    @property
+    def url(self):
+        return self._url
+
+    def get_url(self, endpoint):
+        return f'{self._url}{endpoint}'
+
+    def is_available(self, now):
+        """Not ejected, or the ejection is over and it can be probed again."""
+        return self.ejected_until is None or self.ejected_until <= now
+
+    @property
+    def statistics(self):
+        result = {
+            ATTR_CONNECTED: self.is_connected,
+            ATTR_HEALTHY: self.ejected_until is None,
+            ATTR_OUTSTANDING: self.outstanding,
+            ATTR_REQUESTS: self.requests,
+            ATTR_FAILURES: self.failures,
+            ATTR_AVERAGE_LATENCY: None if self.average_latency is None else round(self.average_latency, 3),
+            ATTR_LAST_LATENCY: None if self.last_latency is None else round(self.last_latency, 3)
+        }
+
+        return result
+
+
+class BackendPool:
+    """Balances requests to the backend with the least outstanding requests.
+
+    Backends that fail several requests in a row are ejected, once the ejection period is over
+    the next request probes them and a successful response admits them back.
+    """
+
+    def __init__(self, backends):
+        self._backends = backends
+        self._lock = threading.Lock()
+
+    @property
+    def backends(self):
+        return self._backends
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+
+            candidates = [backend for backend in self._backends if backend.is_available(now)]
+
+            if len(candidates) > 0:
+                backend = min(candidates, key=self._get_load)
+            else:
+                backend = min(self._backends, key=lambda item: item.ejected_until)
+
+            if backend.ejected_until is not None:
+                _LOGGER.debug(f'Probing DeepStack backend {backend.url}')
+
+                backend.ejected_until = now + BACKEND_EJECTION_TIME
+
+            backend.outstanding += 1
+
+        return backend
+
+    def release(self, backend, is_success, latency=None):
+        with self._lock:
+            backend.outstanding -= 1
+            backend.requests += 1
+            backend.is_connected = is_success
+
+            if is_success:
+                if backend.ejected_until is not None:
+                    _LOGGER.info(f'DeepStack backend {backend.url} is back online')
+
+                backend.consecutive_failures = 0
+                backend.ejected_until = None
+
+                if latency is not None:
+                    backend.last_latency = latency
+
+                    if backend.average_latency is None:
+                        backend.average_latency = latency
+                    else:
+                        backend.average_latency += (latency - backend.average_latency) * BACKEND_LATENCY_SMOOTHING
+
+            else:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+
+                if backend.consecutive_failures >= BACKEND_MAX_FAILURES:
+                    if backend.ejected_until is None:
+                        _LOGGER.warning(f'DeepStack backend {backend.url} ejected after '
+                                        f'{backend.consecutive_failures} failures')
+
+                    backend.ejected_until = time.monotonic() + BACKEND_EJECTION_TIME
+
+    @property
+    def statistics(self):
+        result = {backend.url: backend.statistics for backend in self._backends}
+
+        return result
+
+    @staticmethod
+    def _get_load(backend):
+        average_latency = backend.average_latency
+
+        if average_latency is None:
+            average_latency = 0
+
+        return backend.outstanding, average_latency
@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import os
+import uuid
+
+from datetime import datetime
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """Logs the progress of a transfer every BACKUP_PROGRESS_STEP percent."""
+
+    def __init__(self, description, total):
+        self._description = description
+        self._total = total
+        self._transferred = 0
+        self._next_step = BACKUP_PROGRESS_STEP
+
+    @property
+    def transferred(self):
+        return self._transferred
+
+    def update(self, size):
+        self._transferred += size
+
+        if not self._total:
+            return
+
+        percent = self._transferred * 100 // self._total
+
+        if percent >= self._next_step:
+            _LOGGER.info(f'{self._description}: {percent}% ({self._transferred} of {self._total} bytes)')
+
+            self._next_step = (percent // BACKUP_PROGRESS_STEP + 1) * BACKUP_PROGRESS_STEP
+
+
+class MultipartFileStream:
+    """multipart/form-data body streaming a file in chunks, requests sends it without loading the file.
+
+    Has a length so the request is sent with Content-Length rather than chunked.
+    """
+
+    def __init__(self, fields, file_field, file_path, chunk_size=BACKUP_CHUNK_SIZE):
+        self._boundary = uuid.uuid4().hex
+        self._file_path = file_path
+        self._chunk_size = chunk_size
+        self._file = None
+        self._file_size = os.path.getsize(file_path)
+        self._progress = ProgressReporter(f'Uploading {file_path}', self._file_size)
+
+        preamble = []
+
+        for name, value in fields.items():
+            preamble.append(f'--{self._boundary}\r\n'
+                            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                            f'{value}\r\n')
+
+        file_name = os.path.basename(file_path)
+
+        preamble.append(f'--{self._boundary}\r\n'
+                        f'Content-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+                        f'Content-Type: application/octet-stream\r\n\r\n')
+
+        self._parts = [''.join(preamble).encode(), None, f'\r\n--{self._boundary}--\r\n'.encode()]
+        self._length = len(self._parts[0]) + self._file_size + len(self._parts[2])
+        self._part_index = 0
+        self._part_offset = 0
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self._boundary}'
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self._chunk_size)
+
+            if not chunk:
+                break
+
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+
+        chunks = []
+
+        while size > 0 and self._part_index < len(self._parts):
+            chunk = self._read_part(size)
+
+            if chunk:
+                chunks.append(chunk)
+                size -= len(chunk)
+            else:
+                self._part_index += 1
+                self._part_offset = 0
+
+        return b''.join(chunks)
+
+    def _read_part(self, size):
+        part = self._parts[self._part_index]
+
+        if part is not None:
+            chunk = part[self._part_offset:self._part_offset + size]
+
+            self._part_offset += len(chunk)
+
+            return chunk
+
+        if self._file is None:
+            self._file = open(self._file_path, 'rb')
+
+        chunk = self._file.read(min(size, self._chunk_size))
+
+        if chunk:
+            self._progress.update(len(chunk))
+        else:
+            self.close()
+
+        return chunk
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+            self._file = None
+
+
+class BackupManager:
+    """Timestamped backups with a sha256 sidecar, keeps the latest backups only."""
+
+    def __init__(self, path_builder, keep=DEFAULT_BACKUP_KEEP):
+        self._directory = path_builder(BACKUP_DIRECTORY)
+        self._legacy_path = path_builder(BACKUP_FILE)
+        self._keep = keep
+
+    def create_path(self):
+        os.makedirs(self._directory, exist_ok=True)
+
+        timestamp = datetime.now().strftime(BACKUP_DATE_FORMAT)
+
+        path = os.path.join(self._directory, f'{BACKUP_FILE_PREFIX}{timestamp}{BACKUP_FILE_EXTENSION}')
+
+        return path
+
+    def get_backups(self):
+        """Backups from the newest to the oldest."""
+        backups = []
+
+        if os.path.isdir(self._directory):
+            for file_name in os.listdir(self._directory):
+                if file_name.startswith(BACKUP_FILE_PREFIX) and file_name.endswith(BACKUP_FILE_EXTENSION):
+                    backups.append(os.path.join(self._directory, file_name))
+
+        backups.sort(reverse=True)
+
+        return backups
+
+    def get_latest(self):
+        """Newest backup, the single backup file of previous versions when there are no rotated backups."""
+        backups = self.get_backups()
+
+        if len(backups) > 0:
+            return backups[0]
+
+        if os.path.isfile(self._legacy_path):
+            return self._legacy_path
+
+        return None
+
+    @staticmethod
+    def get_checksum(file_path):
+        checksum = hashlib.sha256()
+
+        with open(file_path, 'rb') as backup_file:
+            for chunk in iter(lambda: backup_file.read(BACKUP_CHUNK_SIZE), b''):
+                checksum.update(chunk)
+
+        return checksum.hexdigest()
+
+    @staticmethod
+    def write_checksum(file_path, checksum):
+        with open(f'{file_path}{BACKUP_CHECKSUM_EXTENSION}', 'w') as checksum_file:
+            checksum_file.write(f'{checksum}  {os.path.basename(file_path)}\n')
+
+    def is_backup_path(self, file_path):
+        """Whether the file is in the backups directory or is the single backup file of previous versions."""
+        real_path = os.path.realpath(file_path)
+        real_directory = os.path.realpath(self._directory)
+
+        result = os.path.dirname(real_path) == real_directory or real_path == os.path.realpath(self._legacy_path)
+
+        return result
+
+    def verify(self, file_path, allow_unverified=False):
+        """Compare the file to its sidecar checksum, files without a sidecar fail unless allow_unverified."""
+        checksum_path = f'{file_path}{BACKUP_CHECKSUM_EXTENSION}'
+
+        if not os.path.isfile(checksum_path):
+            if not allow_unverified:
+                _LOGGER.error(f'No checksum for {file_path}, set {ATTR_ALLOW_UNVERIFIED} to restore it unverified')
+
+                return False
+
+            _LOGGER.warning(f'No checksum for {file_path}, restoring it without verification')
+
+            return True
+
+        with open(checksum_path) as checksum_file:
+            expected_checksum = checksum_file.read().split()[0]
+
+        result = self.get_checksum(file_path) == expected_checksum
+
+        return result
+
+    def rotate(self):
+        for file_path in self.get_backups()[self._keep:]:
+            _LOGGER.info(f'Removing old backup: {file_path}')
+
+            for path in [file_path, f'{file_path}{BACKUP_CHECKSUM_EXTENSION}']:
+                if os.path.isfile(path):
+                    os.remove(path)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import threading
+
+from . import image_utils
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DetectionBatcher:
+    """Collects the frames of all the cameras arriving within window seconds and detects them in one request.
+
+    The frames are tiled into a mosaic of tile_size squares, the predictions are split back to the frames by the tile
+    containing the center of their box. A batch is sent once it has max_batch_size frames or the window has passed,
+    a batch of a single frame is detected as is.
+    """
+
+    def __init__(self, enabled, window, max_batch_size, tile_size, quality, get_region, run_in_executor, detect,
+                 detect_single):
+        self._enabled = enabled
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._tile_size = tile_size
+        self._quality = quality
+        self._get_region = get_region
+        self._run_in_executor = run_in_executor
+        self._detect = detect
+        self._detect_single = detect_single
+        self._pending = []
+        self._timer = None
+        self._batches = 0
+        self._batched_frames = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    async def async_detect(self, frame):
+        """Predictions of the frame in its coordinates, None when the request failed or was dropped."""
+        future = asyncio.get_running_loop().create_future()
+
+        self._pending.append((frame, future))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._window, self._flush)
+
+        result = await future
+
+        return result
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+            self._timer = None
+
+        batch = self._pending
+        self._pending = []
+
+        if len(batch) > 0:
+            asyncio.ensure_future(self._async_process(batch))
+
+    async def _async_process(self, batch):
+        with self._lock:
+            self._batches += 1
+            self._batched_frames += len(batch)
+
+        frames = [frame for frame, future in batch]
+
+        if len(frames) == 1:
+            results = [await self._async_detect_single(frames[0])]
+        else:
+            results = await self._async_detect_batch(frames)
+
+        for (frame, future), result in zip(batch, results):
+            if future.done():
+                continue
+
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _async_detect_single(self, frame):
+        """Predictions of the frame detected as is, the exception when it failed."""
+        try:
+            result = await self._detect_single(frame)
+        except Exception as ex:
+            result = ex
+
+        return result
+
+    async def _async_detect_batch(self, frames):
+        """Predictions (or exception) per frame, frames that cannot be tiled are detected as is."""
+        results = [None for frame in frames]
+
+        try:
+            content, tiles = await self._run_in_executor(self._create_mosaic, frames)
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to create the batch mosaic, detecting the frames separately, Error: {ex}')
+
+            content, tiles = None, [None for frame in frames]
+
+        if content is not None:
+            _LOGGER.debug('Detecting batch of %d frames, %d bytes', len(frames), len(content))
+
+            try:
+                predictions = await self._detect(content, None, False)
+
+                if predictions is not None:
+                    tile_boxes = [(tile[0], tile[1], tile[2]) for tile in tiles if tile is not None]
+
+                    tiles_predictions = iter(image_utils.split_mosaic_predictions(predictions, tile_boxes,
+                                                                                  self._tile_size))
+
+                    for index, tile in enumerate(tiles):
+                        if tile is not None:
+                            tile_predictions = next(tiles_predictions)
+
+                            image_utils.offset_predictions(tile_predictions, tile[3], tile[4])
+
+                            results[index] = tile_predictions
+
+            except Exception as ex:
+                for index, tile in enumerate(tiles):
+                    if tile is not None:
+                        results[index] = ex
+
+        single_indexes = [index for index, tile in enumerate(tiles) if tile is None]
+
+        if len(single_indexes) > 0:
+            single_results = await asyncio.gather(*[self._async_detect_single(frames[index])
+                                                    for index in single_indexes])
+
+            for index, result in zip(single_indexes, single_results):
+                results[index] = result
+
+        return results
+
+    def _create_mosaic(self, frames):
+        """Encoded mosaic of the frames, returns (content, list of (x, y, scale, x offset, y offset) per frame).
+
+        The tile of a frame that cannot be decoded is None, the content is None when less than two frames remain.
+        """
+        regions = []
+
+        for frame in frames:
+            try:
+                region = self._get_region(frame)
+            except Exception as ex:
+                _LOGGER.debug('Failed to decode the frame of %s for the batch, Error: %s', frame.camera_entity_id, ex)
+
+                region = None
+
+            regions.append(region)
+
+        valid_regions = [region for region in regions if region is not None]
+
+        if len(valid_regions) < 2:
+            return None, [None for frame in frames]
+
+        mosaic, tile_boxes = image_utils.create_mosaic([image for image, x_offset, y_offset in valid_regions],
+                                                       self._tile_size)
+
+        tile_boxes = iter(tile_boxes)
+
+        tiles = [None if region is None else next(tile_boxes) + region[1:] for region in regions]
+
+        content = image_utils.encode(mosaic, self._quality)
+
+        return content, tiles
+
+    @property
+    def statistics(self):
+        result = {}
+
+        if self._enabled:
+            with self._lock:
+                average_batch_size = None
+                fill_rate = None
+
+                if self._batches > 0:
+                    average_batch_size = round(self._batched_frames / self._batches, 2)
+                    fill_rate = round(average_batch_size / self._max_batch_size, 2)
+
+                result = {
+                    ATTR_BATCHES: self._batches,
+                    ATTR_AVERAGE_BATCH_SIZE: average_batch_size,
+                    ATTR_BATCH_FILL_RATE: fill_rate
+                }
+
+        return result
@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Fails fast after consecutive failures, a single probe is let through once the cooldown is over."""
+
+    def __init__(self, max_failures, cooldown):
+        self._max_failures = max_failures
+        self._cooldown = cooldown
+        self._state = CIRCUIT_BREAKER_CLOSED
+        self._consecutive_failures = 0
+        self._open_until = None
+        self._trips = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == CIRCUIT_BREAKER_CLOSED:
+                return True
+
+            if self._state == CIRCUIT_BREAKER_OPEN and time.monotonic() >= self._open_until:
+                _LOGGER.info('DeepStack circuit breaker cooldown is over, probing the server')
+
+                self._state = CIRCUIT_BREAKER_HALF_OPEN
+
+                return True
+
+            self._rejected += 1
+
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CIRCUIT_BREAKER_CLOSED:
+                _LOGGER.info('DeepStack circuit breaker closed, server is reachable')
+
+            self._state = CIRCUIT_BREAKER_CLOSED
+            self._consecutive_failures = 0
+            self._open_until = None
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+
+            should_trip = self._state == CIRCUIT_BREAKER_HALF_OPEN or \
+                (self._state == CIRCUIT_BREAKER_CLOSED and self._consecutive_failures >= self._max_failures)
+
+            if should_trip:
+                self._state = CIRCUIT_BREAKER_OPEN
+                self._open_until = time.monotonic() + self._cooldown
+                self._trips += 1
+
+                _LOGGER.warning(f'DeepStack circuit breaker opened after {self._consecutive_failures} failures, '
+                                f'requests will fail fast for {self._cooldown} seconds')
+
+    @property
+    def statistics(self):
+        result = {
+            ATTR_CIRCUIT_BREAKER_STATE: self._state,
+            ATTR_CIRCUIT_BREAKER_TRIPS: self._trips,
+            ATTR_CONSECUTIVE_FAILURES: self._consecutive_failures,
+            ATTR_REJECTED_REQUESTS: self._rejected
+        }
+
+        return result
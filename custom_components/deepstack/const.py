@@ -2,12 +2,77 @@ from datetime import timedelta
 VERSION = '1.0.7'
 
 DEFAULT_TIMEOUT = 10
+# Backup / restore transfers (connect, read) seconds, the server may take a while to pack or load the database
+ADMIN_TRANSFER_TIMEOUT = (DEFAULT_TIMEOUT, 300)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+DEFAULT_CROP_PADDING = 0.2
+DEFAULT_JPEG_QUALITY = 90
+DEFAULT_DETECTION_MAX_SIZE = 800
+DEFAULT_RECOGNITION_MAX_SIZE = 1600
+DEFAULT_FRAME_CACHE_THRESHOLD = 4
+DEFAULT_FRAME_CACHE_TTL = 10
+PERCEPTUAL_HASH_SIZE = 8
+DEFAULT_MOTION_THRESHOLD = 0.02
+MOTION_FRAME_SIZE = (64, 48)
+MOTION_PIXEL_THRESHOLD = 25
+MOTION_BACKGROUND_ALPHA = 0.2
+DEFAULT_MAX_SCAN_INTERVAL = 30
+DEFAULT_REQUESTS_PER_SECOND = 0
+SCAN_BACKOFF_FACTOR = 1.5
+SCAN_INTERVAL_TOLERANCE = 0.2
+BACKEND_MAX_FAILURES = 3
+BACKEND_EJECTION_TIME = 30
+BACKEND_LATENCY_SMOOTHING = 0.2
+DEFAULT_CIRCUIT_BREAKER_FAILURES = 5
+DEFAULT_CIRCUIT_BREAKER_COOLDOWN = 30
+DEFAULT_BULK_REGISTRATION_PARALLELISM = 4
+DEFAULT_FACE_CATALOG_TTL = 300
+DEFAULT_BACKUP_KEEP = 5
+DEFAULT_SNAPSHOT_QUEUE_SIZE = 20
+DEFAULT_SNAPSHOT_DEDUPE_THRESHOLD = 6
+DEFAULT_SNAPSHOT_MAX_FILES = 1000
+DEFAULT_SNAPSHOT_MAX_SIZE = 500
+DEFAULT_SNAPSHOT_MAX_AGE = 30
+SNAPSHOT_FACE_PADDING = 0.3
+DEFAULT_EVENT_HOLD_OFF = 30
+EVENT_COALESCING_SWEEP_INTERVAL = 1
+LOG_SUMMARY_INTERVAL = 60
+DEFAULT_TRACKING_IOU_THRESHOLD = 0.3
+DEFAULT_TRACKING_MAX_AGE = 10
+DEFAULT_TRACKING_REFRESH_INTERVAL = 60
+DEFAULT_BATCH_WINDOW = 0.2
+DEFAULT_MAX_BATCH_SIZE = 4
+DEFAULT_BATCH_TILE_SIZE = 640
+DEFAULT_FACE_INDEX_SIMILARITY = 0.92
+DEFAULT_FACE_INDEX_MARGIN = 0.05
+DEFAULT_FACE_INDEX_MAX_PER_IDENTITY = 20
+FACE_INDEX_VECTOR_SIZE = 32
+FRAME_BROKER_TICK_RATIO = 0.8
+WARM_UP_RETRY_INTERVAL = 5
+WARM_UP_MAX_RETRY_INTERVAL = 60
+WARM_UP_IMAGE_SIZE = (64, 64)
+TRACKING_SMOOTHING = 0.5
+DEFAULT_MIN_CONFIDENCE = 0
+DEFAULT_MIN_AREA = 0
+SNAPSHOT_EXTENSION = '.jpg'
+SNAPSHOT_DATE_FORMAT = '%Y-%m-%d_%H-%M-%S-%f'
+BACKUP_CHUNK_SIZE = 1024 * 1024
+BACKUP_PROGRESS_STEP = 10
+FACE_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+
+CIRCUIT_BREAKER_CLOSED = 'closed'
+CIRCUIT_BREAKER_OPEN = 'open'
+CIRCUIT_BREAKER_HALF_OPEN = 'half_open'
 
 DOMAIN = 'deepstack'
 DATA_DEEP_STACK = f'{DOMAIN}_data'
 
 DEEP_STACK_FACE_RECOGNITION = 'DeepStack Face Recognition'
 DEEP_STACK_FACE_DETECTION = 'DeepStack Face Detection'
+DEEP_STACK_CIRCUIT_BREAKER = 'DeepStack Circuit Breaker'
+DEEP_STACK_DIAGNOSTICS = 'DeepStack Diagnostics'
+DEEP_STACK_FACES = 'DeepStack Faces'
 
 FILE_PATH = 'file_path'
 SERVICE_REGISTER_FACE = 'register_face'
@@ -16,11 +81,79 @@ SERVICE_DISPLAY_RESPONSE_TIME = 'display_response_time'
 SERVICE_CHANGE_CONFIDENCE_LEVEL = 'change_confidence_level'
 SERVICE_LIST_FACES = 'list_faces'
 SERVICE_DELETE_FACE = 'delete_face'
+SERVICE_DUMP_METRICS = 'dump_metrics'
+SERVICE_TRACE = 'trace'
+SERVICE_REGISTER_FACES_BULK = 'register_faces_bulk'
+SERVICE_BACKUP = 'backup'
+SERVICE_RESTORE = 'restore'
+
+ATTR_DIRECTORY = 'directory'
+ATTR_MAX_PARALLEL = 'max_parallel'
+ATTR_STATUS = 'status'
+ATTR_RESULTS = 'results'
+
+REGISTRATION_REGISTERED = 'registered'
+REGISTRATION_SKIPPED = 'skipped'
+REGISTRATION_FAILED = 'failed'
 
 ATTR_CONNECTED = 'connected'
 ATTR_MATCHED_FACES = 'matched_faces'
 ATTR_TOTAL_MATCHED_FACES = 'total_matched_faces'
 ATTR_RESPONSE_TIME_SEC = 'response time (sec)'
+ATTR_POOL_SIZE = 'pool_size'
+ATTR_REQUESTS = 'requests'
+ATTR_CONNECTIONS_OPENED = 'connections_opened'
+ATTR_CONNECTIONS_REUSED = 'connections_reused'
+ATTR_SHARED_DETECTIONS = 'shared_detections'
+ATTR_SHARED_FRAMES = 'shared_frames'
+ATTR_READINESS = 'readiness'
+ATTR_TIME_TO_READY = 'time_to_ready'
+ATTR_IN_FLIGHT = 'in_flight_requests'
+ATTR_QUEUE_DEPTH = 'queue_depth'
+ATTR_MAX_QUEUE_DEPTH = 'max_queue_depth'
+ATTR_AVERAGE_WAIT_TIME = 'average_wait_time'
+ATTR_DROPPED_REQUESTS = 'dropped_requests'
+ATTR_BACKENDS = 'backends'
+ATTR_HEALTHY = 'healthy'
+ATTR_OUTSTANDING = 'outstanding'
+ATTR_FAILURES = 'failures'
+ATTR_AVERAGE_LATENCY = 'average_latency'
+ATTR_LAST_LATENCY = 'last_latency'
+ATTR_CIRCUIT_BREAKER_STATE = 'circuit_breaker'
+ATTR_CIRCUIT_BREAKER_TRIPS = 'circuit_breaker_trips'
+ATTR_CONSECUTIVE_FAILURES = 'consecutive_failures'
+ATTR_REJECTED_REQUESTS = 'rejected_requests'
+ATTR_ORIGINAL_BYTES = 'original_bytes'
+ATTR_UPLOADED_BYTES = 'uploaded_bytes'
+ATTR_PREPROCESSING_TIME = 'average_preprocessing_time'
+ATTR_CACHE_HITS = 'cache_hits'
+ATTR_CACHE_MISSES = 'cache_misses'
+ATTR_MOTION_SCORE = 'motion_score'
+ATTR_MOTION_SKIPS = 'motion_skips'
+ATTR_SCAN_INTERVAL = 'effective_scan_interval'
+ATTR_SCAN_RATE = 'effective_scan_rate'
+ATTR_LAST_UPDATED = 'last_updated'
+ATTR_REFRESH_FAILURES = 'refresh_failures'
+ATTR_SNAPSHOT_QUEUE_DEPTH = 'snapshot_queue_depth'
+ATTR_SNAPSHOTS_WRITTEN = 'snapshots_written'
+ATTR_SNAPSHOTS_DROPPED = 'snapshots_dropped'
+ATTR_SNAPSHOTS_DEDUPLICATED = 'snapshots_deduplicated'
+ATTR_SNAPSHOTS_REMOVED = 'snapshots_removed'
+ATTR_SUPPRESSED_EVENTS = 'suppressed_events'
+ATTR_PRESENT = 'present'
+ATTR_EVENT = 'event'
+ATTR_IDENTITY = 'identity'
+ATTR_TRACKS = 'tracks'
+ATTR_TRACKED_RECOGNITIONS = 'tracked_recognitions'
+ATTR_FILTERED_OBJECTS = 'filtered_objects'
+ATTR_BATCHES = 'batches'
+ATTR_AVERAGE_BATCH_SIZE = 'average_batch_size'
+ATTR_BATCH_FILL_RATE = 'batch_fill_rate'
+ATTR_FACE_INDEX_SIZE = 'face_index_size'
+ATTR_FACE_INDEX_HITS = 'face_index_hits'
+ATTR_FACE_INDEX_MISSES = 'face_index_misses'
+ATTR_FACE_INDEX_HIT_RATE = 'face_index_hit_rate'
+ATTR_FACE_INDEX_MATCH_TIME = 'face_index_match_time'
 
 USER_ID = 'userid'
 UNKNOWN = 'unknown'
@@ -31,27 +164,57 @@ PREDICTIONS = 'predictions'
 FACES = 'faces'
 LABEL = 'label'
 COUNT = 'count'
+ALL = 'all'
 TARGETS = 'targets'
+OBJECTS = 'objects'
+X_MIN = 'x_min'
+Y_MIN = 'y_min'
+X_MAX = 'x_max'
+Y_MAX = 'y_max'
 
 CONF_FACE_RECOGNITION = 'face_recognition'
 CONF_OBJECT_DETECTION = 'object_detection'
 
+CONF_MOTION_FILTER = 'motion_filter'
+CONF_CAMERA_THRESHOLDS = 'camera_thresholds'
+
 CONF_DETECT_FIRST = 'detect_first'
+CONF_CROP_TO_PERSON = 'crop_to_person'
+CONF_CROP_PADDING = 'crop_padding'
 CONF_TARGETS = 'targets'
+CONF_TARGET_FILTERS = 'target_filters'
+CONF_MIN_CONFIDENCE = 'min_confidence'
+CONF_MIN_AREA = 'min_area'
+CONF_ZONES = 'zones'
+CONF_CROP_TO_ZONES = 'crop_to_zones'
 
 ATTR_ENABLED = 'enabled'
+ATTR_ALLOW_UNVERIFIED = 'allow_unverified'
 
 ATTR_CAMERA_NAME = 'name'
 
 DASHED_DATE_FORMAT = '%Y-%m-%d %H-%M-%S'
 
 CONF_UNKNOWN_DIRECTORY = 'unknown_directory'
+CONF_UNKNOWN_FACES_STORAGE = 'unknown_faces_storage'
+CONF_CROP_FACES = 'crop_faces'
+CONF_QUEUE_SIZE = 'queue_size'
+CONF_DEDUPE_THRESHOLD = 'dedupe_threshold'
+CONF_MAX_FILES = 'max_files'
+CONF_MAX_SIZE = 'max_size'
+CONF_MAX_AGE = 'max_age'
 
 EVENT_UNKNOWN_FACE_DETECT = f'{DOMAIN}.unknown_face_detected'
 EVENT_DETECT_OBJECT = f'{DOMAIN}.object_detected'
+EVENT_FACES_REGISTERED = f'{DOMAIN}.faces_registered'
+EVENT_ENTERED = f'{DOMAIN}.entered'
+EVENT_LEFT = f'{DOMAIN}.left'
 
 IMAGE_TIMEOUT = timedelta(seconds=5)
 
+SENSOR_DOMAIN = 'sensor'
+TIME_SECONDS = 's'
+
 PROTOCOLS = {
     True: "https",
     False: "http"
@@ -71,11 +234,84 @@ ENDPOINT_FACE_RECOGNIZE = f'{ENDPOINT_BASE_FACE}recognize'
 ENDPOINT_DETECTION = f'{ENDPOINT_BASE}detection'
 
 BACKUP_FILE = "backup-deepstack.zip"
+BACKUP_DIRECTORY = 'deepstack-backups'
+BACKUP_FILE_PREFIX = 'backup-deepstack-'
+BACKUP_FILE_EXTENSION = '.zip'
+BACKUP_CHECKSUM_EXTENSION = '.sha256'
+BACKUP_PARTIAL_EXTENSION = '.part'
+BACKUP_DATE_FORMAT = '%Y%m%d-%H%M%S'
+RESTORE_FILE_FIELD = 'file'
+FACE_REGISTRY_FILE = 'deepstack-registered-faces.json'
 
 NOTIFICATION_FACE_LIST = 'DeepStack trained faces'
 
 CONF_ADMIN_KEY = 'admin_key'
 CONF_API_KEY = 'api_key'
+CONF_POOL_SIZE = 'pool_size'
+CONF_BACKENDS = 'backends'
+CONF_CIRCUIT_BREAKER = 'circuit_breaker'
+CONF_FAILURES = 'failures'
+CONF_COOLDOWN = 'cooldown'
+CONF_PREPROCESSING = 'preprocessing'
+CONF_DETECTION_MAX_SIZE = 'detection_max_size'
+CONF_RECOGNITION_MAX_SIZE = 'recognition_max_size'
+CONF_JPEG_QUALITY = 'jpeg_quality'
+CONF_MAX_CONCURRENT_REQUESTS = 'max_concurrent_requests'
+CONF_FRAME_CACHE = 'frame_cache'
+CONF_THRESHOLD = 'threshold'
+CONF_TTL = 'ttl'
+CONF_ADAPTIVE_SCAN = 'adaptive_scan'
+CONF_MAX_INTERVAL = 'max_interval'
+CONF_REQUESTS_PER_SECOND = 'requests_per_second'
+CONF_FACE_CATALOG_TTL = 'face_catalog_ttl'
+CONF_BACKUP_KEEP = 'backup_keep'
+CONF_EVENT_COALESCING = 'event_coalescing'
+CONF_HOLD_OFF = 'hold_off'
+CONF_TRACKING = 'tracking'
+CONF_IOU_THRESHOLD = 'iou_threshold'
+CONF_REFRESH_INTERVAL = 'refresh_interval'
+CONF_BATCHING = 'batching'
+CONF_WINDOW = 'window'
+CONF_MAX_BATCH_SIZE = 'max_batch_size'
+CONF_TILE_SIZE = 'tile_size'
+CONF_FACE_INDEX = 'face_index'
+CONF_SIMILARITY = 'similarity'
+CONF_MARGIN = 'margin'
+CONF_MAX_PER_IDENTITY = 'max_per_identity'
+
+READINESS_STARTING = 'starting'
+READINESS_WARMING_UP = 'warming_up'
+READINESS_READY = 'ready'
+
+OPERATION_DETECT = 'detect'
+OPERATION_RECOGNIZE = 'recognize'
+
+REQUEST_PRIORITY_RECOGNIZE = 0
+REQUEST_PRIORITY_DETECT = 1
+REQUEST_PRIORITY_ADMIN = 2
+
+REQUEST_PRIORITIES = {
+    OPERATION_RECOGNIZE: REQUEST_PRIORITY_RECOGNIZE,
+    OPERATION_DETECT: REQUEST_PRIORITY_DETECT
+}
+
+STAGE_FETCH = 'fetch'
+STAGE_PREPROCESS = 'preprocess'
+STAGE_UPLOAD = 'upload'
+STAGE_INFERENCE = 'inference'
+STAGE_REQUEST = 'request'
+STAGE_PARSE = 'parse'
+STAGE_EVENT = 'event'
+STAGE_TOTAL = 'total'
+
+METRICS_NAME = 'deepstack_stage_latency_seconds'
+METRICS_FILE = 'deepstack-metrics.prom'
+METRICS_WINDOW_SIZE = 500
+METRICS_QUANTILES = {
+    'p50': 0.5,
+    'p95': 0.95,
+    'p99': 0.99
+}
 
 TARGET_PERSON = 'person'
 
@@ -1,13 +1,32 @@
+import os
 import sys
+import asyncio
 import logging
 import time
 
-from datetime import datetime
-from homeassistant.util import slugify
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from homeassistant.const import (CONF_HOST, CONF_PORT, ATTR_NAME, ATTR_ENTITY_ID, CONF_SSL)
 from homeassistant.components.image_processing import (CONF_CONFIDENCE, DEFAULT_CONFIDENCE, EVENT_DETECT_FACE)
 
+from . import image_utils
+from .activity_log import ActivityLog
+from .batch_coordinator import DetectionBatcher
 from .deepstack_api import DeepStackAPI
+from .event_coalescer import EventCoalescer
+from .face_catalog import FaceCatalog
+from .face_index import FaceIndex
+from .face_registry import FaceRegistry
+from .frame_broker import FrameBroker
+from .frame_cache import FrameCache
+from .frame_pipeline import Frame, FramePipeline
+from .metrics import Metrics
+from .motion_filter import MotionFilter
+from .person_tracker import PersonTracker
+from .preprocessor import Preprocessor
+from .scan_scheduler import ScanScheduler
+from .snapshot_writer import SnapshotWriter
+from .zone_filter import ZoneFilter
 from .home_assistant import HomeAssistant
 from .const import *
 
@@ -21,23 +40,123 @@ class DeepStack:
         ssl = config.get(CONF_SSL, False)
         admin_key = config.get(CONF_ADMIN_KEY)
         api_key = config.get(CONF_API_KEY)
+        pool_size = config.get(CONF_POOL_SIZE, DEFAULT_POOL_SIZE)
+        max_concurrent_requests = config.get(CONF_MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS)
+        circuit_breaker = config.get(CONF_CIRCUIT_BREAKER, {})
+        circuit_breaker_failures = circuit_breaker.get(CONF_FAILURES, DEFAULT_CIRCUIT_BREAKER_FAILURES)
+        circuit_breaker_cooldown = circuit_breaker.get(CONF_COOLDOWN, DEFAULT_CIRCUIT_BREAKER_COOLDOWN)
+        backup_keep = config.get(CONF_BACKUP_KEEP, DEFAULT_BACKUP_KEEP)
 
         allow_backup_restore = admin_key is not None
 
         self._ha = HomeAssistant(hass, allow_backup_restore)
-        self._api = DeepStackAPI(host, port, ssl, api_key, admin_key, self._ha.path_builder)
-        self._is_api_connected = False
+        backends = []
+
+        if host is not None:
+            backends.append((host, port, ssl))
+
+        for backend in config.get(CONF_BACKENDS, []):
+            backends.append((backend.get(CONF_HOST), backend.get(CONF_PORT), backend.get(CONF_SSL, False)))
+
+        if len(backends) == 0:
+            _LOGGER.error(f'No DeepStack server configured, set {CONF_HOST} or {CONF_BACKENDS}')
+
+            raise ValueError(f'Either {CONF_HOST} or {CONF_BACKENDS} must be configured')
+
+        self._metrics = Metrics()
+        self._api = DeepStackAPI(backends, api_key, admin_key, self._ha.path_builder, self._ha.create_client_session,
+                                 pool_size, max_concurrent_requests, circuit_breaker_failures,
+                                 circuit_breaker_cooldown, self._metrics, backup_keep)
+        self._pool_size = pool_size
         self._is_initialized = False
+        self._readiness = READINESS_STARTING
+        self._time_to_ready = None
         self._confidence = config.get(CONF_CONFIDENCE, DEFAULT_CONFIDENCE)
         self._unknown_directory = config.get(CONF_UNKNOWN_DIRECTORY, '')
         self._display_response_time = False
-        self._allow_save_unknown_faces = self._ha.is_valid_directory_path(self._unknown_directory)
+        allow_save_unknown_faces = self._ha.is_valid_directory_path(self._unknown_directory)
         self._processors = []
+        self._pipeline = FramePipeline()
+        self._frame_broker = FrameBroker()
+        self._activity_log = ActivityLog()
+        self._motion_filter = MotionFilter()
+        self._zone_filter = ZoneFilter()
+        self._face_registry = FaceRegistry(self._ha.path_builder(FACE_REGISTRY_FILE))
+
+        self._face_catalog = FaceCatalog(self._api.list_faces)
+        self._face_catalog_ttl = config.get(CONF_FACE_CATALOG_TTL, DEFAULT_FACE_CATALOG_TTL)
+
+        preprocessing = config.get(CONF_PREPROCESSING, {})
+
+        self._preprocessor = Preprocessor(preprocessing.get(ATTR_ENABLED, False),
+                                          preprocessing.get(CONF_DETECTION_MAX_SIZE, DEFAULT_DETECTION_MAX_SIZE),
+                                          preprocessing.get(CONF_RECOGNITION_MAX_SIZE, DEFAULT_RECOGNITION_MAX_SIZE),
+                                          preprocessing.get(CONF_JPEG_QUALITY, DEFAULT_JPEG_QUALITY))
+
+        adaptive_scan = config.get(CONF_ADAPTIVE_SCAN, {})
+
+        self._scheduler = ScanScheduler(adaptive_scan.get(ATTR_ENABLED, False),
+                                        adaptive_scan.get(CONF_MAX_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+                                        adaptive_scan.get(CONF_REQUESTS_PER_SECOND, DEFAULT_REQUESTS_PER_SECOND))
+
+        unknown_faces_storage = config.get(CONF_UNKNOWN_FACES_STORAGE, {})
+
+        self._snapshot_writer = SnapshotWriter(self._unknown_directory, allow_save_unknown_faces,
+                                               unknown_faces_storage.get(CONF_CROP_FACES, False),
+                                               unknown_faces_storage.get(CONF_QUEUE_SIZE, DEFAULT_SNAPSHOT_QUEUE_SIZE),
+                                               unknown_faces_storage.get(CONF_DEDUPE_THRESHOLD,
+                                                                         DEFAULT_SNAPSHOT_DEDUPE_THRESHOLD),
+                                               unknown_faces_storage.get(CONF_MAX_FILES, DEFAULT_SNAPSHOT_MAX_FILES),
+                                               unknown_faces_storage.get(CONF_MAX_SIZE, DEFAULT_SNAPSHOT_MAX_SIZE),
+                                               unknown_faces_storage.get(CONF_MAX_AGE, DEFAULT_SNAPSHOT_MAX_AGE))
+
+        event_coalescing = config.get(CONF_EVENT_COALESCING, {})
+
+        self._event_coalescer = EventCoalescer(event_coalescing.get(ATTR_ENABLED, False),
+                                               event_coalescing.get(CONF_HOLD_OFF, DEFAULT_EVENT_HOLD_OFF))
+
+        tracking = config.get(CONF_TRACKING, {})
+
+        self._tracker = PersonTracker(tracking.get(ATTR_ENABLED, False),
+                                      tracking.get(CONF_IOU_THRESHOLD, DEFAULT_TRACKING_IOU_THRESHOLD),
+                                      tracking.get(CONF_MAX_AGE, DEFAULT_TRACKING_MAX_AGE),
+                                      tracking.get(CONF_REFRESH_INTERVAL, DEFAULT_TRACKING_REFRESH_INTERVAL))
+
+        frame_cache = config.get(CONF_FRAME_CACHE, {})
+
+        self._frame_cache = FrameCache(frame_cache.get(ATTR_ENABLED, False),
+                                       frame_cache.get(CONF_THRESHOLD, DEFAULT_FRAME_CACHE_THRESHOLD),
+                                       frame_cache.get(CONF_TTL, DEFAULT_FRAME_CACHE_TTL))
+
+        face_index = config.get(CONF_FACE_INDEX, {})
+
+        self._face_index = FaceIndex(face_index.get(ATTR_ENABLED, False),
+                                     face_index.get(CONF_SIMILARITY, DEFAULT_FACE_INDEX_SIMILARITY),
+                                     face_index.get(CONF_MARGIN, DEFAULT_FACE_INDEX_MARGIN),
+                                     face_index.get(CONF_MAX_PER_IDENTITY, DEFAULT_FACE_INDEX_MAX_PER_IDENTITY))
+
+        if self._face_index.enabled:
+            _LOGGER.warning('Face index is enabled, it compares face pixels and may answer a person crop with the '
+                            'name of another person under similar lighting / pose without asking DeepStack')
+
+        batching = config.get(CONF_BATCHING, {})
+
+        self._batcher = DetectionBatcher(batching.get(ATTR_ENABLED, False),
+                                         batching.get(CONF_WINDOW, DEFAULT_BATCH_WINDOW),
+                                         batching.get(CONF_MAX_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZE),
+                                         batching.get(CONF_TILE_SIZE, DEFAULT_BATCH_TILE_SIZE),
+                                         preprocessing.get(CONF_JPEG_QUALITY, DEFAULT_JPEG_QUALITY),
+                                         self._get_detection_region, self._ha.async_run_in_executor,
+                                         self._api.async_detect, self._async_detect_frame)
 
         def service_register_face(service):
             """Handle for services."""
             self.register(service.data)
 
+        def service_register_faces_bulk(service):
+            """Handle for services."""
+            self.register_bulk(service.data)
+
         def service_display_response_time(service):
             """Handle for services."""
             enabled = service.data.get(ATTR_ENABLED, False)
@@ -52,29 +171,112 @@ class DeepStack:
 
         def service_list_faces(event_time):
             """Handle for services."""
-            _LOGGER.debug(f'List faces called at: {event_time}')
+            _LOGGER.debug('List faces called at: %s', event_time)
             self.list_faces()
 
         def service_delete_face(service):
             """Handle for services."""
             self.delete_face(service.data)
 
+        def service_dump_metrics(service):
+            """Handle for services."""
+            self.dump_metrics()
+
+        def service_backup(service):
+            """Handle for services."""
+            self.backup()
+
+        def service_restore(service):
+            """Handle for services."""
+            self.restore(service.data)
+
+        def service_trace(service):
+            """Handle for services."""
+            self._activity_log.set_trace(service.data.get(ATTR_ENABLED, False))
+
         self._ha.initialize(service_change_confidence_level, service_display_response_time, service_register_face,
-                            service_list_faces, service_delete_face)
+                            service_list_faces, service_delete_face, service_dump_metrics,
+                            service_register_faces_bulk, service_backup, service_restore, service_trace)
 
         self._is_initialized = True
 
+    def start(self):
+        """Start the background jobs, DeepStack is contacted by the warm up only."""
+        self._snapshot_writer.start()
+
+        if self._event_coalescer.enabled:
+            self._ha.track_time_interval(self.fire_left_events, timedelta(seconds=EVENT_COALESCING_SWEEP_INTERVAL))
+
+        self._ha.listen_stop(self._snapshot_writer.stop)
+        self._ha.track_time_interval(self.refresh_faces, timedelta(seconds=self._face_catalog_ttl))
+        self._ha.track_time_interval(self._activity_log.log_summary, timedelta(seconds=LOG_SUMMARY_INTERVAL))
+
+    async def async_warm_up(self):
+        """Load the face catalog and run a test inference in parallel until DeepStack answers.
+
+        Image processors stay inactive until the integration is ready.
+        """
+        start_time = time.monotonic()
+        retry_interval = WARM_UP_RETRY_INTERVAL
+
+        self._readiness = READINESS_WARMING_UP
+
+        while True:
+            tasks = [self._async_test_inference()]
+
+            if not self._face_catalog.is_loaded:
+                tasks.append(self._ha.async_run_in_executor(self.refresh_faces))
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+            if results[0] is True:
+                break
+
+            _LOGGER.warning(f'DeepStack is not available yet, retrying in {retry_interval} seconds')
+
+            await asyncio.sleep(retry_interval)
+
+            retry_interval = min(retry_interval * 2, WARM_UP_MAX_RETRY_INTERVAL)
+
+        self._time_to_ready = round(time.monotonic() - start_time, 2)
+        self._readiness = READINESS_READY
+
+        _LOGGER.info(f'DeepStack is ready after {self._time_to_ready} seconds')
+
+    async def _async_test_inference(self):
+        """Detect objects in a blank image, returns whether DeepStack answered."""
+        content = await self._ha.async_run_in_executor(image_utils.create_blank_image, WARM_UP_IMAGE_SIZE)
+
+        predictions = await self._api.async_detect(content, None, False)
+
+        result = predictions is not None
+
+        return result
+
     @property
     def is_initialized(self):
         return self._is_initialized
 
+    @property
+    def is_ready(self):
+        return self._readiness == READINESS_READY
+
+    @property
+    def readiness(self):
+        result = {
+            ATTR_READINESS: self._readiness,
+            ATTR_TIME_TO_READY: self._time_to_ready
+        }
+
+        return result
+
     @property
     def processors(self):
         return self._processors
 
     @property
     def is_api_connected(self):
-        return self._is_api_connected
+        return self._api.is_connected
 
     @property
     def confidence(self):
@@ -84,12 +286,153 @@ class DeepStack:
     def display_response_time(self):
         return self._display_response_time
 
+    @property
+    def api_statistics(self):
+        return self._api.statistics
+
+    @property
+    def circuit_breaker(self):
+        return self._api.circuit_breaker
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @property
+    def face_index_enabled(self):
+        return self._face_index.enabled
+
+    @property
+    def face_catalog(self):
+        return self._face_catalog
+
+    def get_statistics(self, camera_entity_id, operation=None):
+        result = {
+            ATTR_SHARED_DETECTIONS: self._pipeline.get_shared_detections(camera_entity_id)
+        }
+
+        result.update(self._frame_broker.get_statistics(camera_entity_id))
+
+        if operation is not None:
+            result.update(self._scheduler.get_statistics(camera_entity_id, operation))
+
+        result.update(self._frame_cache.get_statistics(camera_entity_id))
+        result.update(self._motion_filter.get_statistics(camera_entity_id))
+        result.update(self._zone_filter.get_statistics(camera_entity_id))
+        result.update(self._event_coalescer.get_statistics(camera_entity_id))
+        result.update(self.api_statistics)
+        result.update(self._preprocessor.statistics)
+        result.update(self._batcher.statistics)
+
+        if operation == OPERATION_RECOGNIZE:
+            result.update(self._snapshot_writer.statistics)
+            result.update(self._tracker.get_statistics(camera_entity_id))
+            result.update(self._face_index.statistics)
+
+        result[ATTR_BACKENDS] = self._api.backends_statistics
+
+        return result
+
     def add_processor(self, processor):
         self._processors.append(processor)
 
+        pool_size = max(self._pool_size, len(self._processors))
+
+        self._api.change_pool_size(pool_size)
+
+    def register_scan(self, camera_entity_id, operation, scan_interval):
+        self._scheduler.register(camera_entity_id, operation, scan_interval)
+        self._frame_broker.register(camera_entity_id, scan_interval)
+
+    async def async_get_frame(self, camera_entity_id, fetch):
+        """Frame of the camera shared by its processors within the same tick."""
+        frame = await self._frame_broker.async_get_frame(camera_entity_id, fetch)
+
+        return frame
+
+    def is_scan_due(self, camera_entity_id, operation):
+        return self._scheduler.is_due(camera_entity_id, operation)
+
+    def report_scan(self, camera_entity_id, operation, is_active):
+        self._scheduler.report(camera_entity_id, operation, is_active)
+
+    def set_motion_threshold(self, camera_entity_id, threshold):
+        self._motion_filter.set_threshold(camera_entity_id, threshold)
+
+    def set_object_filters(self, camera_entity_id, zones, target_filters, crop_to_zones):
+        self._zone_filter.set_filters(camera_entity_id, zones, target_filters, crop_to_zones)
+
+    def is_motion_detected(self, image, camera_entity_id):
+        """Decodes the frame, runs in the executor."""
+        frame = Frame.create(image, camera_entity_id)
+
+        result = self._motion_filter.is_motion_detected(frame)
+
+        if not result:
+            _LOGGER.debug('No motion in frame of %s, skipping', camera_entity_id)
+
+        return result
+
+    async def async_is_motion_detected(self, image, camera_entity_id):
+        result = True
+
+        if self._motion_filter.is_enabled(camera_entity_id):
+            result = await self._ha.async_run_in_executor(self.is_motion_detected, image, camera_entity_id)
+
+        return result
+
     def change_api_timeout(self, scan_interval):
         self._api.change_time_out(scan_interval)
 
+    def dump_metrics(self):
+        """Write the latency histograms in Prometheus text format into the configuration directory."""
+        file_path = self._ha.path_builder(METRICS_FILE)
+
+        try:
+            with open(file_path, 'w') as metrics_file:
+                metrics_file.write(self._metrics.to_prometheus())
+
+            _LOGGER.info(f'Metrics stored to: {file_path}')
+        except Exception as ex:
+            _LOGGER.error(f'Failed to store metrics to: {file_path}, Error: {ex}')
+
+    def refresh_faces(self, event_time=None):
+        """Reload the face catalog from DeepStack, runs in the background at startup and every face_catalog_ttl."""
+        self._face_catalog.refresh()
+
+        if self._face_catalog.is_loaded:
+            self._face_index.retain(self._face_catalog.faces)
+
+    def backup(self):
+        backup_path = self._api.backup()
+
+        if backup_path is None:
+            message = 'Backup failed, see the log for details'
+        else:
+            message = f'Backup stored to: {backup_path}'
+
+        self._ha.display_message(message)
+
+    def restore(self, service_data):
+        backup_path = service_data.get(FILE_PATH)
+        allow_unverified = service_data.get(ATTR_ALLOW_UNVERIFIED, False)
+
+        if backup_path is not None and not self._ha.is_valid_file_path(backup_path):
+            self._ha.display_message(f'Restore failed, {backup_path} is not an allowed file')
+
+            return
+
+        restored_path = self._api.restore(backup_path, allow_unverified)
+
+        if restored_path is None:
+            message = 'Restore failed, see the log for details'
+        else:
+            message = f'Restored from: {restored_path}'
+
+            self.refresh_faces()
+
+        self._ha.display_message(message)
+
     def list_faces(self):
         faces = self.get_registered_faces()
 
@@ -99,50 +442,374 @@ class DeepStack:
 
         self._ha.display_message(message)
 
-    def detect(self, image, camera_entity_id, targets, fire_event_on_detection=True):
-        result = {
-            COUNT: 0,
-            TARGETS: []
-        }
+    async def async_detect(self, image, camera_entity_id, targets, fire_event_on_detection=True, apply_filters=True):
+        result = self._create_detect_result()
+
+        try:
+            if self.is_initialized:
+                start_time = time.monotonic()
+                frame = Frame.create(image, camera_entity_id)
 
-        if self.is_initialized:
-            count = None
-            target_list = {}
+                predictions = await self._async_get_detection(frame)
+
+                self._handle_detection(result, predictions, camera_entity_id, targets, fire_event_on_detection,
+                                       apply_filters)
+
+                self._activity_log.record(camera_entity_id, OPERATION_DETECT, time.monotonic() - start_time,
+                                          result[COUNT] or 0)
+
+            else:
+                _LOGGER.info('Detect called before fully initialized')
+
+        except Exception as ex:
+            exc_type, exc_obj, tb = sys.exc_info()
+            line_number = tb.tb_lineno
+
+            _LOGGER.error(f'Failed to detect objects ({camera_entity_id}), Error: {ex}, Line: {line_number}')
+
+        return result
+
+    async def async_recognize(self, image, camera_entity_id, camera_name, detect_first, crop_to_person=False,
+                              crop_padding=DEFAULT_CROP_PADDING):
+        result = self._create_recognize_result()
+
+        try:
+            start_time = time.time()
+
+            if self.is_initialized:
+                frame = Frame.create(image, camera_entity_id)
+                person_detected = True
+                persons = []
+
+                if detect_first:
+                    # Internal person check, the object detection processor fires the (filtered) events
+                    detect_result = await self.async_detect(frame, camera_entity_id, [TARGET_PERSON],
+                                                            fire_event_on_detection=False, apply_filters=False)
+
+                    person_detected = self._is_person_in_result(detect_result)
+                    persons = detect_result.get(OBJECTS, [])
+                else:
+                    _LOGGER.debug('Skip person detection')
+
+                if person_detected:
+                    if self._tracker.enabled and len(persons) > 0:
+                        predictions = await self._async_get_tracked_recognition(frame, persons, crop_to_person,
+                                                                                crop_padding)
+                    else:
+                        predictions = await self._async_get_recognition(frame, persons, crop_to_person,
+                                                                        crop_padding)
+
+                    unknown_faces = self._handle_recognition(result, predictions, camera_entity_id, camera_name)
+
+                    if len(unknown_faces) > 0:
+                        await self._ha.async_run_in_executor(self.unknown_faces_detected, frame, camera_name,
+                                                             unknown_faces)
+
+            else:
+                _LOGGER.info('Recognize called before fully initialized')
+
+            response_time = time.time() - start_time
+
+            result[ATTR_RESPONSE_TIME_SEC] = round(response_time, 1)
+            result[ATTR_CONNECTED] = self.is_api_connected
+
+            self._activity_log.record(camera_entity_id, OPERATION_RECOGNIZE, response_time,
+                                      result[ATTR_TOTAL_MATCHED_FACES])
+
+        except Exception as ex:
+            exc_type, exc_obj, tb = sys.exc_info()
+            line_number = tb.tb_lineno
+
+            _LOGGER.error(f'Failed to process image ({camera_name}), Error: {ex}, Line: {line_number}')
+
+        self._activity_log.trace(OPERATION_RECOGNIZE, camera_entity_id, result)
+
+        return result
 
-            predictions = self._api.detect(image)
+    async def _async_get_detection(self, frame):
+        """Detect objects once per frame, processors of the same camera wait for and reuse the result."""
+        async with self._pipeline.async_lock(frame.camera_entity_id):
+            predictions = self._pipeline.get_detection(frame)
 
-            if predictions is not None:
-                count = 0
-                for prediction in predictions:
-                    label = prediction.get(LABEL)
-                    if label in targets:
-                        target_count = 0
+            if predictions is None:
+                predictions = await self._async_get_cached(frame, OPERATION_DETECT)
 
-                        if label in target_list:
-                            target_count = int(target_list[label])
+                if predictions is None:
+                    if self._batcher.enabled:
+                        predictions = await self._batcher.async_detect(frame)
+                    else:
+                        predictions = await self._async_detect_frame(frame)
 
-                        target_list[label] = target_count + 1
-                        count = count + 1
+                    # None is a failed / dropped request, only the outcome of this request decides the caching
+                    if predictions is not None:
+                        await self._async_set_cached(frame, OPERATION_DETECT, predictions)
 
-            result[COUNT] = count
-            result[TARGETS] = target_list
+                # Shared with the other processors of the camera only when this frame was detected successfully
+                if predictions is not None:
+                    self._pipeline.set_detection(frame, predictions)
 
-            if count > 0 and fire_event_on_detection:
-                event_data = {
-                    ATTR_ENTITY_ID: camera_entity_id,
-                    TARGETS: target_list
-                }
+        return predictions
 
-                self._ha.fire_event(EVENT_DETECT_OBJECT, event_data)
+    async def _async_detect_frame(self, frame):
+        content, scale, x_offset, y_offset = await self._async_prepare_detection(frame)
 
-            _LOGGER.debug(f'Detect result: {result}')
+        predictions = await self._api.async_detect(content, frame.camera_entity_id)
+        predictions = self._map_predictions(predictions, scale, x_offset, y_offset)
 
+        return predictions
+
+    async def _async_get_recognition(self, frame, persons, crop_to_person, crop_padding):
+        predictions = await self._async_get_cached(frame, OPERATION_RECOGNIZE)
+
+        if predictions is None:
+            is_success = False
+
+            if crop_to_person and len(persons) > 0:
+                recognized = await self._async_recognize_persons(frame, persons, crop_padding)
+
+                if recognized is not None:
+                    predictions, is_success = recognized
+
+            if predictions is None:
+                content, scale = await self._async_prepare(frame, OPERATION_RECOGNIZE)
+
+                predictions = await self._api.async_recognize(content, frame.camera_entity_id)
+                predictions = self._map_predictions(predictions, scale)
+
+                is_success = predictions is not None
+
+            if is_success:
+                await self._async_set_cached(frame, OPERATION_RECOGNIZE, predictions)
+
+        return predictions
+
+    async def _async_get_tracked_recognition(self, frame, persons, crop_to_person, crop_padding):
+        """Recognize only the faces of new / uncertain tracks, the other tracks carry their identity forward."""
+        tracks = self._tracker.update(frame.camera_entity_id, persons)
+        pending = self._tracker.get_pending(tracks, self._confidence / 100)
+
+        unassigned = []
+
+        if len(pending) > 0:
+            pending_persons = [track.to_person() for track in pending]
+
+            predictions = await self._async_get_recognition(frame, pending_persons, crop_to_person, crop_padding)
+
+            if predictions is None:
+                return None
+
+            unassigned = self._tracker.assign(tracks, predictions)
+
+        result = self._tracker.get_predictions(frame.camera_entity_id, tracks, len(pending) > 0) + unassigned
+
+        return result
+
+    def _prepare_detection(self, frame):
+        """Content to detect, cropped to the zones of the camera with crop_to_zones, returns (content, scale, x, y)."""
+        if self._zone_filter.get_crop_box(frame.camera_entity_id) is not None:
+            try:
+                with self._metrics.measure(STAGE_PREPROCESS, frame.camera_entity_id, OPERATION_DETECT):
+                    image, x_offset, y_offset = self._get_detection_region(frame)
+
+                    content, scale = self._preprocessor.prepare_image(image, OPERATION_DETECT)
+
+                return content, scale, x_offset, y_offset
+
+            except Exception as ex:
+                _LOGGER.warning(f'Failed to crop frame of {frame.camera_entity_id} to its zones, Error: {ex}')
+
+        content, scale = self._prepare(frame, OPERATION_DETECT)
+
+        return content, scale, 0, 0
+
+    def _get_detection_region(self, frame):
+        """Decoded part of the frame to detect, the zones of the camera with crop_to_zones, returns (image, x, y)."""
+        image = frame.image
+        crop_box = self._zone_filter.get_crop_box(frame.camera_entity_id)
+
+        if crop_box is None:
+            return image, 0, 0
+
+        width, height = image.size
+
+        crop_box = (crop_box[0], crop_box[1], min(crop_box[2], width), min(crop_box[3], height))
+
+        return image.crop(crop_box), crop_box[0], crop_box[1]
+
+    async def _async_prepare_detection(self, frame):
+        if self._zone_filter.get_crop_box(frame.camera_entity_id) is None:
+            content, scale = await self._async_prepare(frame, OPERATION_DETECT)
+
+            return content, scale, 0, 0
+
+        result = await self._ha.async_run_in_executor(self._prepare_detection, frame)
+
+        return result
+
+    def _prepare(self, frame, operation):
+        if not self._preprocessor.enabled:
+            return frame.content, 1
+
+        with self._metrics.measure(STAGE_PREPROCESS, frame.camera_entity_id, operation):
+            result = self._preprocessor.prepare(frame, operation)
+
+        return result
+
+    async def _async_prepare(self, frame, operation):
+        """Preprocessing decodes and encodes the frame so it is done in the executor."""
+        if self._preprocessor.enabled:
+            result = await self._ha.async_run_in_executor(self._prepare, frame, operation)
         else:
-            _LOGGER.info(f'Detect called before fully initialized')
+            result = frame.content, 1
+
+        return result
+
+    @staticmethod
+    def _map_predictions(predictions, scale, x_offset=0, y_offset=0):
+        """Map the boxes of predictions made on a resized / cropped image back to the frame coordinates."""
+        if predictions is not None:
+            image_utils.scale_predictions(predictions, scale)
+            image_utils.offset_predictions(predictions, x_offset, y_offset)
+
+        return predictions
+
+    async def _async_get_cached(self, frame, operation):
+        """Frame cache look up, hashing decodes the frame so it is done in the executor."""
+        predictions = None
+
+        if self._frame_cache.enabled:
+            predictions = await self._ha.async_run_in_executor(self._frame_cache.get, frame, operation)
+
+        return predictions
+
+    async def _async_set_cached(self, frame, operation, predictions):
+        if self._frame_cache.enabled:
+            await self._ha.async_run_in_executor(self._frame_cache.set, frame, operation, predictions)
+
+    async def _async_recognize_persons(self, frame, persons, crop_padding):
+        """Recognize faces only within the person boxes, returns None when the frame cannot be cropped.
+
+        Returns (predictions, whether all the regions were recognized), the faces of failed regions are missing.
+        """
+        cropped = await self._ha.async_run_in_executor(self._crop_persons, frame, persons, crop_padding)
+
+        if cropped is None:
+            return None
+
+        regions, predictions = cropped
+
+        tasks = [self._api.async_recognize(content, frame.camera_entity_id, False)
+                 for content, scale, x_offset, y_offset, signature in regions]
+
+        regions_predictions = await asyncio.gather(*tasks)
+
+        is_success = True
+
+        for region, region_predictions in zip(regions, regions_predictions):
+            content, scale, x_offset, y_offset, signature = region
+
+            if region_predictions is None:
+                is_success = False
+
+                continue
+
+            region_predictions = self._map_predictions(region_predictions, scale, x_offset, y_offset)
+
+            if signature is not None:
+                await self._ha.async_run_in_executor(self._index_faces, signature, region_predictions, x_offset,
+                                                     y_offset)
+
+            predictions.extend(region_predictions)
+
+        return predictions, is_success
+
+    def _crop_persons(self, frame, persons, crop_padding):
+        """Person regions of the frame to recognize and the faces of the regions matched by the face index.
+
+        Returns (list of (content, scale, x offset, y offset, region image), predictions),
+        None when the frame cannot be cropped, region image is kept for the face index only.
+        """
+        result = None
+
+        try:
+            regions = []
+            predictions = []
+
+            for region_image, x_offset, y_offset in image_utils.crop_regions(frame.image, persons, crop_padding):
+                signature = None
+
+                if self._face_index.enabled:
+                    signature = region_image
+
+                    match = self._face_index.match(region_image)
+
+                    if match is not None:
+                        predictions.append(self._create_indexed_face(match, region_image.size, x_offset, y_offset))
+
+                        continue
+
+                content, scale = self._preprocessor.prepare_image(region_image, OPERATION_RECOGNIZE)
+
+                regions.append((content, scale, x_offset, y_offset, signature))
+
+            _LOGGER.debug('Recognizing %d person regions of %s, %d matched by the face index',
+                          len(regions), frame.camera_entity_id, len(predictions))
+
+            result = regions, predictions
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to crop persons of {frame.camera_entity_id}, using full frame, Error: {ex}')
+
+        return result
+
+    def _index_faces(self, signature, predictions, x_offset, y_offset):
+        """Add a region with a single unknown / confidently recognized face to the face index."""
+        if signature is None or len(predictions) != 1:
+            return
+
+        prediction = predictions[0]
+        identity = prediction.get(USER_ID, UNKNOWN)
+        confidence = prediction.get(CONF_CONFIDENCE, 0)
+
+        if identity != UNKNOWN and confidence < self._confidence / 100:
+            return
+
+        width, height = signature.size
+        x_min, y_min, x_max, y_max = image_utils.get_box(prediction)
+
+        relative_box = ((x_min - x_offset) / width, (y_min - y_offset) / height,
+                        (x_max - x_offset) / width, (y_max - y_offset) / height)
+
+        self._face_index.add(signature, identity, confidence, relative_box)
+
+    @staticmethod
+    def _create_indexed_face(match, size, x_offset, y_offset):
+        identity, confidence, relative_box = match
+        width, height = size
+
+        prediction = {
+            USER_ID: identity,
+            CONF_CONFIDENCE: confidence,
+            X_MIN: int(relative_box[0] * width) + x_offset,
+            Y_MIN: int(relative_box[1] * height) + y_offset,
+            X_MAX: int(relative_box[2] * width) + x_offset,
+            Y_MAX: int(relative_box[3] * height) + y_offset
+        }
+
+        return prediction
+
+    @staticmethod
+    def _create_detect_result():
+        result = {
+            COUNT: 0,
+            TARGETS: [],
+            OBJECTS: []
+        }
 
         return result
 
-    def recognize(self, image, camera_entity_id, camera_name, detect_first):
+    @staticmethod
+    def _create_recognize_result():
         result = {
             FACES: [],
             ATTR_TOTAL_MATCHED_FACES: 0,
@@ -150,76 +817,95 @@ class DeepStack:
             ATTR_RESPONSE_TIME_SEC: None
         }
 
-        try:
-            start_time = time.time()
+        return result
 
-            if self.is_initialized:
-                faces = []
-                matched_faces = []
-                person_detected = True
+    def _handle_detection(self, result, predictions, camera_entity_id, targets, fire_event_on_detection,
+                          apply_filters=True):
+        """Fill the detect result, zones and target filters apply to the object detection only."""
+        count = None
+        target_list = {}
+        objects = []
 
-                if detect_first:
-                    person_detected = self.is_person_detected(image, camera_entity_id)
-                else:
-                    _LOGGER.debug(f'Skip person detection')
+        if apply_filters:
+            predictions = self._zone_filter.filter(camera_entity_id, predictions)
 
-                if person_detected:
-                    predictions = self._api.recognize(image)
-                    unknown_faces = []
+        if predictions is not None:
+            count = 0
+            for prediction in predictions:
+                label = prediction.get(LABEL)
+                if label in targets:
+                    target_count = 0
+
+                    if label in target_list:
+                        target_count = int(target_list[label])
+
+                    target_list[label] = target_count + 1
+                    count = count + 1
 
-                    for prediction in predictions:
-                        confidence = prediction.get(CONF_CONFIDENCE, 0)
-                        confidence = round(confidence * 100, 1)
+                    objects.append(prediction)
 
-                        user_id = prediction.get(USER_ID)
+        result[COUNT] = count
+        result[TARGETS] = target_list
+        result[OBJECTS] = objects
 
-                        face = {
-                            USER_ID: user_id,
-                            CONF_CONFIDENCE: confidence,
-                            ATTR_ENTITY_ID: camera_entity_id,
-                            ATTR_CAMERA_NAME: camera_name
-                        }
+        if count is not None and count > 0 and fire_event_on_detection:
+            event_data = {
+                ATTR_ENTITY_ID: camera_entity_id,
+                TARGETS: target_list
+            }
 
-                        faces.append(face)
+            self._fire_event(EVENT_DETECT_OBJECT, event_data, camera_entity_id, list(target_list.keys()))
 
-                        if bool(user_id == UNKNOWN):
-                            unknown_faces.append(face)
+        self._activity_log.trace(OPERATION_DETECT, camera_entity_id, result)
 
-                            _LOGGER.debug(f'Unknown face found')
-                        else:
-                            matched_face_details = f'{user_id}: {confidence}'
-                            _LOGGER.info(f'{matched_face_details} identified')
+    def _handle_recognition(self, result, predictions, camera_entity_id, camera_name):
+        """Fill the recognize result, fire identified faces and return the predictions of the unknown faces."""
+        faces = []
+        matched_faces = []
+        unknown_faces = []
 
-                            matched_faces.append(matched_face_details)
+        if predictions is None:
+            _LOGGER.debug('Recognize request of %s failed or was dropped', camera_name)
 
-                            self.face_identified(face)
+            predictions = []
 
-                    result[FACES] = faces
-                    result[ATTR_TOTAL_MATCHED_FACES] = len(faces)
-                    result[ATTR_MATCHED_FACES] = ', '.join(matched_faces)
+        for prediction in predictions:
+            confidence = prediction.get(CONF_CONFIDENCE, 0)
+            confidence = round(confidence * 100, 1)
 
-                    unknown_faces_count = len(unknown_faces)
+            user_id = prediction.get(USER_ID)
 
-                    if unknown_faces_count > 0:
-                        _LOGGER.info(f'{unknown_faces_count} Unknown faces found')
+            face = {
+                USER_ID: user_id,
+                CONF_CONFIDENCE: confidence,
+                ATTR_ENTITY_ID: camera_entity_id,
+                ATTR_CAMERA_NAME: camera_name
+            }
 
-                        self.unknown_faces_detected(image, camera_entity_id, camera_name)
+            faces.append(face)
 
+            if bool(user_id == UNKNOWN):
+                unknown_faces.append(prediction)
+
+                _LOGGER.debug('Unknown face found by %s', camera_name)
             else:
-                _LOGGER.info(f'Recognize called before fully initialized')
+                matched_face_details = f'{user_id}: {confidence}'
+                _LOGGER.debug('%s identified by %s', matched_face_details, camera_name)
 
-            result[ATTR_RESPONSE_TIME_SEC] = round(time.time() - start_time, 1)
-            result[ATTR_CONNECTED] = self.is_api_connected
+                matched_faces.append(matched_face_details)
 
-        except Exception as ex:
-            exc_type, exc_obj, tb = sys.exc_info()
-            line_number = tb.tb_lineno
+                self.face_identified(face)
 
-            _LOGGER.error(f'Failed to process image ({camera_name}), Error: {ex}, Line: {line_number}')
+        result[FACES] = faces
+        result[ATTR_TOTAL_MATCHED_FACES] = len(faces)
+        result[ATTR_MATCHED_FACES] = ', '.join(matched_faces)
 
-        _LOGGER.debug(f'Recognize result: {result}')
+        unknown_faces_count = len(unknown_faces)
 
-        return result
+        if unknown_faces_count > 0:
+            _LOGGER.debug('%d unknown faces found by %s', unknown_faces_count, camera_name)
+
+        return unknown_faces
 
     def register(self, service_data):
         name = service_data.get(ATTR_NAME)
@@ -228,7 +914,9 @@ class DeepStack:
         is_valid_file_path = self._ha.is_valid_file_path(image_path)
 
         if is_valid_file_path:
-            self._api.register_face(name, image_path)
+            self._register_face_file(name, image_path, True)
+
+            self._face_registry.save()
 
         faces = self.get_registered_faces()
         faces_message = ', '.join(faces)
@@ -237,10 +925,121 @@ class DeepStack:
 
         self._ha.display_message(message)
 
+    def register_bulk(self, service_data):
+        """Register the images of a directory with a sub directory per person, uploads run in parallel.
+
+        Images registered before (same content and name) are skipped, the faces are listed once at the end.
+        """
+        directory = service_data.get(ATTR_DIRECTORY)
+        max_parallel = service_data.get(ATTR_MAX_PARALLEL, DEFAULT_BULK_REGISTRATION_PARALLELISM)
+
+        if not self._ha.is_valid_directory_path(directory):
+            return
+
+        images = self._get_face_images(directory)
+
+        _LOGGER.info(f'Registering {len(images)} images from: {directory}, parallel uploads: {max_parallel}')
+
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            futures = [executor.submit(self._register_face_file, name, file_path) for name, file_path in images]
+
+            statuses = [future.result() for future in futures]
+
+        self._face_registry.save()
+
+        results = []
+        failed_files = []
+
+        for image, status in zip(images, statuses):
+            name, file_path = image
+
+            results.append({
+                ATTR_NAME: name,
+                FILE_PATH: file_path,
+                ATTR_STATUS: status
+            })
+
+            if status == REGISTRATION_FAILED:
+                failed_files.append(file_path)
+
+        self._ha.fire_event(EVENT_FACES_REGISTERED, {
+            ATTR_DIRECTORY: directory,
+            ATTR_RESULTS: results
+        })
+
+        registered = statuses.count(REGISTRATION_REGISTERED)
+        skipped = statuses.count(REGISTRATION_SKIPPED)
+
+        faces = self.get_registered_faces()
+        faces_message = ', '.join(faces)
+
+        message = f'{registered} images were registered, {skipped} skipped as registered before'
+
+        if len(failed_files) > 0:
+            message = f'{message}, failed to register: {", ".join(failed_files)}'
+
+        message = f'{message}, available faces: {faces_message}'
+
+        self._ha.display_message(message)
+
+    @staticmethod
+    def _get_face_images(directory):
+        """List of (name, file path), the name is the sub directory of the directory the image is in."""
+        images = []
+
+        for entry in sorted(os.scandir(directory), key=lambda item: item.name):
+            if not entry.is_dir():
+                continue
+
+            for root, directories, files in os.walk(entry.path):
+                for file_name in sorted(files):
+                    extension = os.path.splitext(file_name)[1].lower()
+
+                    if extension in FACE_IMAGE_EXTENSIONS:
+                        images.append((entry.name, os.path.join(root, file_name)))
+
+        return images
+
+    def _register_face_file(self, name, file_path, force=False):
+        """Upload a face image unless it was registered before for the same name, returns the registration status."""
+        try:
+            with open(file_path, 'rb') as image_file:
+                image_data = image_file.read()
+
+        except Exception as ex:
+            _LOGGER.error(f'Failed to register face for {name}, Cannot read file: {file_path}, Error: {ex}')
+
+            return REGISTRATION_FAILED
+
+        digest = self._face_registry.get_digest(image_data)
+
+        if not force and self._face_registry.is_registered(digest, name):
+            _LOGGER.debug(f'Skipping {file_path}, registered before for {name}')
+
+            return REGISTRATION_SKIPPED
+
+        if not self._api.register_face_image(name, image_data, file_path):
+            return REGISTRATION_FAILED
+
+        self._face_registry.add(digest, name)
+        self._face_catalog.add(name)
+        self._face_index.remove(name)
+
+        return REGISTRATION_REGISTERED
+
     def delete_face(self, service_data):
         name = service_data.get(ATTR_NAME)
 
-        self._api.delete_face(name)
+        if not self._api.delete_face(name):
+            self._ha.display_message(f'Failed to delete {name}, see the log for details')
+
+            return
+
+        self._face_registry.remove(name)
+        self._face_registry.save()
+
+        self._face_catalog.remove(name)
+        self._face_index.remove(name)
 
         faces = self.get_registered_faces()
         faces_message = ', '.join(faces)
@@ -250,52 +1049,81 @@ class DeepStack:
         self._ha.display_message(message)
 
     def get_registered_faces(self):
-        faces = self._api.list_faces()
+        """Faces of the catalog, no request is sent to DeepStack."""
+        faces = self._face_catalog.faces
 
         return faces
 
-    def is_person_detected(self, image, camera_entity_id):
+    @staticmethod
+    def _is_person_in_result(detect_result):
         result = False
 
-        detect_result = self.detect(image, camera_entity_id, [TARGET_PERSON])
-
         person_data = detect_result.get(TARGETS, {})
         persons_found = person_data.get(TARGET_PERSON, 0)
 
         if persons_found > 0:
             result = True
 
-        _LOGGER.debug(f'Person detection API result: {detect_result}, Final decision: {result}')
+        _LOGGER.debug('Person detection API result: %s, Final decision: %s', detect_result, result)
 
         return result
 
-    def save_unknown_faces(self, image, camera_entity_id):
-        file_path = None
+    def save_unknown_faces(self, frame, unknown_faces, on_written=None):
+        """Queue the snapshot to the background writer, on_written gets its path (None when not stored)."""
+        self._snapshot_writer.enqueue(frame, unknown_faces, on_written)
+
+    def face_identified(self, face):
+        confidence = face.get(CONF_CONFIDENCE, 0)
+
+        if confidence >= self._confidence:
+            self._fire_event(EVENT_DETECT_FACE, face, face.get(ATTR_ENTITY_ID), [face.get(USER_ID)])
 
-        if self._allow_save_unknown_faces:
-            current_date = slugify(datetime.now().strftime(DASHED_DATE_FORMAT))
+    def unknown_faces_detected(self, frame, camera_name, unknown_faces):
+        """Runs in the executor, the duplicates check of the snapshot may decode the frame.
 
-            base_file_path = f'{self._unknown_directory}/{slugify(camera_entity_id)}_{current_date}'
-            file_path = f'{base_file_path}.jpg'
+        The event is fired once the snapshot is written so its file_path can be read by automations.
+        """
+        camera_entity_id = frame.camera_entity_id
 
-            with open(file_path, 'wb') as img_file:
-                img_file.write(image)
+        def on_written(file_path):
+            event_data = {
+                ATTR_ENTITY_ID: camera_entity_id,
+                ATTR_CAMERA_NAME: camera_name,
+                FILE_PATH: file_path
+            }
 
-        return file_path
+            self._fire_event(EVENT_UNKNOWN_FACE_DETECT, event_data, camera_entity_id, [UNKNOWN])
 
-    def face_identified(self, face):
-        confidence = face.get(CONF_CONFIDENCE, 0)
+        self.save_unknown_faces(frame, unknown_faces, on_written)
 
-        if confidence >= self._confidence:
-            self._ha.fire_event(EVENT_DETECT_FACE, face)
+    def _fire_event(self, name, data, camera_entity_id, identities=None):
+        """Fire an event, with coalescing events of identities already in view are suppressed."""
+        if identities is not None and self._event_coalescer.enabled:
+            entered, should_fire = self._event_coalescer.observe(camera_entity_id, name, identities)
 
-    def unknown_faces_detected(self, image, camera_entity_id, camera_name):
-        file_path = self.save_unknown_faces(image, camera_entity_id)
+            for identity in entered:
+                self._fire_transition(EVENT_ENTERED, camera_entity_id, name, identity)
 
+            if not should_fire:
+                return
+
+        with self._metrics.measure(STAGE_EVENT, camera_entity_id, name):
+            self._ha.fire_event(name, data)
+
+        self._activity_log.record_event(camera_entity_id)
+
+    def fire_left_events(self, event_time=None):
+        for camera_entity_id, name, identity in self._event_coalescer.pop_left():
+            self._fire_transition(EVENT_LEFT, camera_entity_id, name, identity)
+
+    def _fire_transition(self, transition, camera_entity_id, name, identity):
         event_data = {
             ATTR_ENTITY_ID: camera_entity_id,
-            ATTR_CAMERA_NAME: camera_name,
-            FILE_PATH: file_path
+            ATTR_EVENT: name,
+            ATTR_IDENTITY: identity
         }
 
-        self._ha.fire_event(EVENT_UNKNOWN_FACE_DETECT, event_data)
+        with self._metrics.measure(STAGE_EVENT, camera_entity_id, transition):
+            self._ha.fire_event(transition, event_data)
+
+        self._activity_log.record_event(camera_entity_id)
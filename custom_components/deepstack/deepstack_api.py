@@ -1,9 +1,20 @@
+import os
 import sys
+import time
+import asyncio
+import hashlib
 import logging
-import shutil
+import aiohttp
 import requests
 
+from requests.adapters import HTTPAdapter
+
+from .backend_pool import Backend, BackendPool
+from .backup_manager import BackupManager, MultipartFileStream, ProgressReporter
+from .circuit_breaker import CircuitBreaker
 from .const import *
+from .metrics import Metrics
+from .request_limiter import RequestLimiter
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -11,36 +22,124 @@ _LOGGER = logging.getLogger(__name__)
 class DeepStackAPI:
     """Perform a face classification."""
 
-    def __init__(self, host, port, ssl, api_key, admin_key, path_builder):
-        """Init with the API key and model id."""
-        protocol = PROTOCOLS[ssl]
-
-        deepstack_url = f'{protocol}://{host}:{port}'
-
+    def __init__(self, backends, api_key, admin_key, path_builder, session_provider,
+                 pool_size=DEFAULT_POOL_SIZE, max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                 circuit_breaker_failures=DEFAULT_CIRCUIT_BREAKER_FAILURES,
+                 circuit_breaker_cooldown=DEFAULT_CIRCUIT_BREAKER_COOLDOWN, metrics=None,
+                 backup_keep=DEFAULT_BACKUP_KEEP):
+        """Init with the backends (list of host, port, ssl) and the API key."""
         self._api_key = api_key
         self._admin_key = admin_key
 
-        self._face_detect_url = f'{deepstack_url}{ENDPOINT_DETECTION}'
-
-        self._face_recognize_url = f'{deepstack_url}{ENDPOINT_FACE_RECOGNIZE}'
-        self._face_register_url = f'{deepstack_url}{ENDPOINT_FACE_REGISTER}'
-        self._face_delete_url = f'{deepstack_url}{ENDPOINT_FACE_DELETE}'
-        self._face_list_url = f'{deepstack_url}{ENDPOINT_FACE_LIST}'
+        self._backends = BackendPool([Backend(host, port, ssl) for host, port, ssl in backends])
 
-        self._backup_url = f'{deepstack_url}{ENDPOINT_BACKUP}'
-        self._restore_url = f'{deepstack_url}{ENDPOINT_RESTORE}'
-
-        self._backup_path = path_builder(BACKUP_FILE)
+        self._backup_manager = BackupManager(path_builder, backup_keep)
+        self._session_provider = session_provider
+        self._limiter = RequestLimiter(max_concurrent_requests)
+        self._circuit_breaker = CircuitBreaker(circuit_breaker_failures, circuit_breaker_cooldown)
+        self._metrics = Metrics() if metrics is None else metrics
+        self._trace_config = self._create_trace_config()
         self._connected = False
         self._timeout = DEFAULT_TIMEOUT
 
+        self._pool_size = None
+        self._session = requests.Session()
+        self._client_session = None
+        self._client_session_pool_size = None
+        self._async_requests = 0
+        self._async_connections_opened = 0
+        self._async_connections_reused = 0
+
+        self.change_pool_size(pool_size)
+
     def change_time_out(self, timeout):
         self._timeout = timeout
 
+    def change_pool_size(self, pool_size):
+        """Mount a keep-alive connection pool able to hold a connection per processor.
+
+        The aiohttp session of the image requests is replaced with a session of the new size on its next use.
+        """
+        if pool_size == self._pool_size:
+            return
+
+        _LOGGER.debug(f'Changing connection pool size from {self._pool_size} to {pool_size}')
+
+        self._pool_size = pool_size
+
+        previous_adapters = list(self._session.adapters.values())
+
+        adapter = HTTPAdapter(pool_connections=len(self._backends.backends), pool_maxsize=pool_size)
+
+        self._session.mount(f'{PROTOCOLS[True]}://', adapter)
+        self._session.mount(f'{PROTOCOLS[False]}://', adapter)
+
+        for previous_adapter in previous_adapters:
+            previous_adapter.close()
+
+    def _get_client_session(self):
+        """aiohttp session of the image requests, must be called from the event loop."""
+        if self._client_session_pool_size != self._pool_size:
+            previous_session = self._client_session
+
+            self._client_session = self._session_provider(self._pool_size, [self._trace_config])
+            self._client_session_pool_size = self._pool_size
+
+            if previous_session is not None:
+                asyncio.ensure_future(self._async_close_client_session(previous_session))
+
+        return self._client_session
+
+    async def _async_close_client_session(self, session):
+        """Close a replaced session once the requests sent with it timed out at the latest."""
+        await asyncio.sleep(self._timeout + 1)
+
+        await session.close()
+
     @property
     def is_connected(self):
         return self._connected
 
+    @property
+    def circuit_breaker(self):
+        return self._circuit_breaker
+
+    @property
+    def statistics(self):
+        """Connection reuse counters of the keep-alive pools, aiohttp (image requests) and requests (admin requests)."""
+        requests_count = self._async_requests
+        connections_count = self._async_connections_opened
+        connections_reused = self._async_connections_reused
+
+        adapters = set(self._session.adapters.values())
+
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+
+            for key in pools.keys():
+                pool = pools.get(key)
+
+                if pool is not None:
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+                    connections_reused += max(pool.num_requests - pool.num_connections, 0)
+
+        result = {
+            ATTR_POOL_SIZE: self._pool_size,
+            ATTR_REQUESTS: requests_count,
+            ATTR_CONNECTIONS_OPENED: connections_count,
+            ATTR_CONNECTIONS_REUSED: connections_reused
+        }
+
+        result.update(self._limiter.statistics)
+        result.update(self._circuit_breaker.statistics)
+
+        return result
+
+    @property
+    def backends_statistics(self):
+        return self._backends.statistics
+
     def enrich_data(self, data=None):
         if data is None:
             data = {}
@@ -59,22 +158,73 @@ class DeepStackAPI:
 
         return data
 
-    def recognize(self, image):
-        """Post an image to the classifier."""
-        failure_error_message = f'Failed to recognize faces in the image, URL: {self._face_recognize_url}'
+    async def async_recognize(self, image, camera_entity_id=None, is_droppable=True):
+        """Post an image to the classifier, returns None when the request failed or was dropped by the limiter."""
+        response = await self._async_post_image(ENDPOINT_FACE_RECOGNIZE, OPERATION_RECOGNIZE, image,
+                                                camera_entity_id, is_droppable,
+                                                'Failed to recognize faces in the image')
+
+        return response
+
+    async def async_detect(self, image, camera_entity_id=None, is_droppable=True):
+        """Post an image to the classifier, returns None when the request failed or was dropped by the limiter."""
+        response = await self._async_post_image(ENDPOINT_DETECTION, OPERATION_DETECT, image, camera_entity_id,
+                                                is_droppable, 'Failed to detect object in the image')
+
+        return response
+
+    @staticmethod
+    def _get_limiter_key(operation, camera_entity_id, is_droppable):
+        """Queued requests with the same key are replaced by the newest one."""
+        key = None
+
+        if is_droppable and camera_entity_id is not None:
+            key = (camera_entity_id, operation)
+
+        return key
+
+    async def _async_post_image(self, endpoint, operation, image, camera_entity_id, is_droppable, failure_message):
+        priority = REQUEST_PRIORITIES[operation]
+        key = self._get_limiter_key(operation, camera_entity_id, is_droppable)
+
+        if not await self._limiter.async_acquire(priority, key, self._timeout):
+            return None
+
+        if not self._circuit_breaker.allow_request():
+            _LOGGER.debug('%s, DeepStack circuit breaker is open', failure_message)
+
+            self._connected = False
+            self._limiter.release()
+
+            return None
+
+        backend = self._backends.acquire()
+        url = backend.get_url(endpoint)
+        failure_error_message = f'{failure_message}, URL: {url}'
 
-        response = []
+        response = None
 
         connected = False
+        start_time = time.monotonic()
 
         try:
-            data = self.enrich_data()
+            data = aiohttp.FormData()
+
+            for field_name, value in self.enrich_data().items():
+                data.add_field(field_name, value)
 
-            response_data = requests.post(self._face_recognize_url, files={IMAGE: image}, data=data, timeout=self._timeout)
+            data.add_field(IMAGE, image, filename=IMAGE)
 
-            response_data.raise_for_status()
+            timeout = aiohttp.ClientTimeout(total=self._timeout)
+            session = self._get_client_session()
+            trace_request_ctx = (camera_entity_id, operation)
 
-            json = response_data.json()
+            async with session.post(url, data=data, timeout=timeout,
+                                    trace_request_ctx=trace_request_ctx) as response_data:
+                response_data.raise_for_status()
+
+                with self._metrics.measure(STAGE_PARSE, camera_entity_id, operation):
+                    json = await response_data.json(content_type=None)
 
             if PREDICTIONS in json:
                 response = json[PREDICTIONS]
@@ -83,7 +233,7 @@ class DeepStackAPI:
             else:
                 _LOGGER.error(f'{failure_error_message}, Invalid response: {json}')
 
-        except requests.exceptions.ConnectionError as cex:
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as cex:
             _LOGGER.error(f'{failure_error_message}, Communication error: {cex}')
 
         except Exception as ex:
@@ -94,57 +244,105 @@ class DeepStackAPI:
         finally:
             self._connected = connected
 
+            self._backends.release(backend, connected, time.monotonic() - start_time)
+            self._limiter.release()
+
+            if connected:
+                self._circuit_breaker.record_success()
+            else:
+                self._circuit_breaker.record_failure()
+
         return response
 
-    def detect(self, image):
-        """Post an image to the classifier."""
-        failure_error_message = f'Failed to detect object in the image, URL: {self._face_detect_url}'
+    def _create_trace_config(self):
+        """Splits the aiohttp requests time into upload (until the body is sent) and inference (until headers)."""
+        trace_config = aiohttp.TraceConfig()
 
-        response = []
+        async def on_request_start(session, context, params):
+            context.start_time = time.monotonic()
+            context.sent_time = context.start_time
 
-        connected = False
+            self._async_requests += 1
 
-        try:
-            data = self.enrich_data()
+        async def on_connection_create_end(session, context, params):
+            self._async_connections_opened += 1
 
-            response_data = requests.post(self._face_detect_url, files={IMAGE: image}, data=data, timeout=self._timeout)
+        async def on_connection_reuseconn(session, context, params):
+            self._async_connections_reused += 1
 
-            response_data.raise_for_status()
+        async def on_request_chunk_sent(session, context, params):
+            context.sent_time = time.monotonic()
 
-            json = response_data.json()
+        async def on_request_end(session, context, params):
+            if context.trace_request_ctx is None:
+                return
 
-            if PREDICTIONS in json:
-                response = json[PREDICTIONS]
+            camera_entity_id, operation = context.trace_request_ctx
+            end_time = time.monotonic()
 
-                connected = True
-            else:
-                _LOGGER.error(f'{failure_error_message}, Invalid response: {json}')
+            self._metrics.observe(STAGE_UPLOAD, context.sent_time - context.start_time, camera_entity_id, operation)
+            self._metrics.observe(STAGE_INFERENCE, end_time - context.sent_time, camera_entity_id, operation)
 
-        except requests.exceptions.ConnectionError as cex:
-            _LOGGER.error(f'{failure_error_message}, Communication error: {cex}')
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
 
-        except Exception as ex:
-            exc_type, exc_obj, tb = sys.exc_info()
-            line_number = tb.tb_lineno
+        return trace_config
 
-            _LOGGER.error(f'{failure_error_message}, Error: {ex}, Line: {line_number}')
+    def _admin_post(self, url, *args, **kwargs):
+        """Admin requests wait behind the image processing requests but are never dropped."""
+        self._limiter.acquire(REQUEST_PRIORITY_ADMIN)
+
+        try:
+            response = self._session.post(url, *args, **kwargs)
         finally:
-            self._connected = connected
+            self._limiter.release()
 
         return response
 
     def register_face(self, name, file_path):
-        """ Register a name to a file. """
-        failure_error_message = f'Failed to register face for {name}, URL: {self._face_register_url}'
+        """ Register a name to a file, on every backend as each of them has its own faces database. """
+        try:
+            with open(file_path, "rb") as image:
+                image_data = image.read()
+
+        except Exception as ex:
+            _LOGGER.error(f'Failed to register face for {name}, Cannot read file: {file_path}, Error: {ex}')
+
+            return False
+
+        result = self.register_face_image(name, image_data, file_path)
+
+        return result
+
+    def register_face_image(self, name, image_data, file_path):
+        """Register an image already read into memory, returns whether all the backends registered it."""
+        result = True
+
+        for backend in self._backends.backends:
+            is_success = self._register_face(backend, name, file_path, image_data)
+
+            result = result and is_success
+
+        return result
+
+    def _register_face(self, backend, name, file_path, image_data):
+        url = backend.get_url(ENDPOINT_FACE_REGISTER)
+        failure_error_message = f'Failed to register face for {name}, URL: {url}'
+        is_success = False
+
         try:
             data = self.enrich_data({USER_ID: name})
 
-            with open(file_path, "rb") as image:
-                response = requests.post(self._face_register_url, files={IMAGE: image.read()}, data=data)
+            response = self._admin_post(url, files={IMAGE: image_data}, data=data)
 
             response.raise_for_status()
 
             if response.json()[SUCCESS]:
+                is_success = True
+
                 _LOGGER.info(f'Register face for {name} using file {file_path}')
             else:
                 error = response.json()[ERROR]
@@ -159,80 +357,191 @@ class DeepStackAPI:
 
             _LOGGER.error(f'{failure_error_message}, from file: {file_path}, Error: {ex}, Line: {line_number}')
 
+        return is_success
+
     def delete_face(self, name):
-        try:
-            _LOGGER.info(f'Deleting face of: {name}')
+        """Delete the face from every backend, returns whether all the backends deleted it."""
+        _LOGGER.info(f'Deleting face of: {name}')
+
+        result = True
+
+        for backend in self._backends.backends:
+            is_success = self._delete_face(backend, name)
+
+            result = result and is_success
 
+        return result
+
+    def _delete_face(self, backend, name):
+        url = backend.get_url(ENDPOINT_FACE_DELETE)
+        is_success = False
+
+        try:
             data = self.enrich_data({USER_ID: name})
 
-            response = requests.post(self._face_delete_url, data=data, timeout=self._timeout)
+            response = self._admin_post(url, data=data, timeout=self._timeout)
 
             response.raise_for_status()
 
             json = response.json()
 
             _LOGGER.info(f'Face ({name}) deleting result for: {json}')
+
+            if json[SUCCESS]:
+                is_success = True
+            else:
+                _LOGGER.warning(f'Delete face failed, URL: {url}, Error message: {json.get(ERROR)}')
+
         except Exception as ex:
             exc_type, exc_obj, tb = sys.exc_info()
             line_number = tb.tb_lineno
 
-            _LOGGER.error(f'Delete face failed, URL: {self._face_delete_url}, Error: {ex}, Line: {line_number}')
+            _LOGGER.error(f'Delete face failed, URL: {url}, Error: {ex}, Line: {line_number}')
+
+        return is_success
 
     def list_faces(self):
         faces = None
+
+        backend = self._backends.acquire()
+        url = backend.get_url(ENDPOINT_FACE_LIST)
+        is_success = False
+
         try:
             data = self.enrich_data()
 
-            response = requests.post(self._face_list_url, data, timeout=self._timeout)
+            response = self._admin_post(url, data, timeout=self._timeout)
 
             response.raise_for_status()
 
             faces = response.json()[FACES]
+            is_success = True
 
             _LOGGER.info(f'Following faces are listed: {faces}')
         except Exception as ex:
             exc_type, exc_obj, tb = sys.exc_info()
             line_number = tb.tb_lineno
 
-            _LOGGER.error(f'Restore failed, URL: {self._face_list_url}, Error: {ex}, Line: {line_number}')
+            _LOGGER.error(f'List faces failed, URL: {url}, Error: {ex}, Line: {line_number}')
+        finally:
+            self._backends.release(backend, is_success)
 
         return faces
 
     def backup(self):
+        """Stream the backup into a timestamped file with a sha256 sidecar, returns the path or None on failure."""
+        backend = self._backends.acquire()
+        url = backend.get_url(ENDPOINT_BACKUP)
+        backup_path = self._backup_manager.create_path()
+        partial_path = f'{backup_path}{BACKUP_PARTIAL_EXTENSION}'
+        is_success = False
+
         try:
             _LOGGER.info('Backing up...')
 
             request_data = self.enrich_admin_data()
 
-            data = requests.post(self._backup_url, stream=True, data=request_data)
+            checksum = hashlib.sha256()
+
+            with self._admin_post(url, stream=True, data=request_data, timeout=ADMIN_TRANSFER_TIMEOUT) as response:
+                response.raise_for_status()
 
-            with open(self._backup_path, "wb") as file:
-                shutil.copyfileobj(data.raw, file)
+                total = int(response.headers.get('Content-Length', 0))
+                progress = ProgressReporter(f'Downloading backup from {backend.url}', total)
 
-            del data
+                with open(partial_path, "wb") as file:
+                    for chunk in response.iter_content(BACKUP_CHUNK_SIZE):
+                        file.write(chunk)
+                        checksum.update(chunk)
 
-            _LOGGER.info(f'Backup store to: {self._backup_path}')
+                        progress.update(len(chunk))
+
+            if total and progress.transferred != total:
+                raise IOError(f'Incomplete backup, received {progress.transferred} of {total} bytes')
+
+            os.replace(partial_path, backup_path)
+
+            self._backup_manager.write_checksum(backup_path, checksum.hexdigest())
+            self._backup_manager.rotate()
+
+            is_success = True
+
+            _LOGGER.info(f'Backup store to: {backup_path}, size: {progress.transferred} bytes')
         except Exception as ex:
             exc_type, exc_obj, tb = sys.exc_info()
             line_number = tb.tb_lineno
 
-            _LOGGER.error(f'Backup failed, URL: {self._backup_url}, Error: {ex}, Line: {line_number}')
+            _LOGGER.error(f'Backup failed, URL: {url}, Error: {ex}, Line: {line_number}')
+
+            if os.path.isfile(partial_path):
+                os.remove(partial_path)
+
+            backup_path = None
+        finally:
+            self._backends.release(backend, is_success)
+
+        return backup_path
+
+    def restore(self, backup_path=None, allow_unverified=False):
+        """Restore a backup (latest by default) to every backend, so all of them share the same faces database.
+
+        Only files of the backups directory are restored, a backup without checksum requires allow_unverified.
+        Returns the restored path or None when there is nothing valid to restore or a backend failed to restore it.
+        """
+        if backup_path is None:
+            backup_path = self._backup_manager.get_latest()
+
+        if backup_path is None or not os.path.isfile(backup_path):
+            _LOGGER.error(f'Restore failed, backup not found: {backup_path}')
+
+            return None
+
+        if not self._backup_manager.is_backup_path(backup_path):
+            _LOGGER.error(f'Restore failed, {backup_path} is not in the {BACKUP_DIRECTORY} directory')
+
+            return None
+
+        if not self._backup_manager.verify(backup_path, allow_unverified):
+            _LOGGER.error(f'Restore failed, checksum of {backup_path} could not be verified')
+
+            return None
+
+        failed_backends = [backend.url for backend in self._backends.backends
+                           if not self._restore(backend, backup_path)]
+
+        if len(failed_backends) > 0:
+            _LOGGER.error(f'Restore of {backup_path} failed for: {", ".join(failed_backends)}')
+
+            return None
+
+        return backup_path
+
+    def _restore(self, backend, backup_path):
+        """Restore the backup to the backend, returns whether it succeeded."""
+        url = backend.get_url(ENDPOINT_RESTORE)
+        is_success = False
 
-    def restore(self):
         try:
-            _LOGGER.info(f'Restoring from: {self._backup_path}')
+            _LOGGER.info(f'Restoring from: {backup_path}')
 
             request_data = self.enrich_admin_data()
 
-            image_data = open(self._backup_path, "rb").read()
+            with MultipartFileStream(request_data, RESTORE_FILE_FIELD, backup_path) as body:
+                headers = {
+                    'Content-Type': body.content_type
+                }
 
-            response = requests.post(self._restore_url, files={"file": image_data}, data=request_data)
+                response = self._admin_post(url, data=body, headers=headers, timeout=ADMIN_TRANSFER_TIMEOUT)
 
             response.raise_for_status()
 
             _LOGGER.info(f'Restore result: {response.json()}')
+
+            is_success = True
         except Exception as ex:
             exc_type, exc_obj, tb = sys.exc_info()
             line_number = tb.tb_lineno
 
-            _LOGGER.error(f'Restore failed, URL: {self._restore_url}, Error: {ex}, Line: {line_number}')
+            _LOGGER.error(f'Restore failed, URL: {url}, Error: {ex}, Line: {line_number}')
+
+        return is_success
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TrackedIdentity:
+    """Object label or face of a camera that is currently in view."""
+
+    def __init__(self, now):
+        self.last_seen = now
+        self.last_fired = now
+
+
+class EventCoalescer:
+    """Coalesces the events of an identity (object label / face) per camera.
+
+    The event fires when the identity enters the view and then at most once per hold_off seconds while it stays,
+    an identity that was not seen for hold_off seconds has left.
+    """
+
+    def __init__(self, enabled, hold_off):
+        self._enabled = enabled
+        self._hold_off = hold_off
+        self._identities = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def observe(self, camera_entity_id, event_name, identities):
+        """Track the identities of an event, returns (entered identities, whether the event should fire)."""
+        now = time.monotonic()
+
+        entered = []
+        should_fire = False
+
+        with self._lock:
+            for identity in identities:
+                key = (camera_entity_id, event_name, identity)
+                tracked_identity = self._identities.get(key)
+
+                if tracked_identity is None:
+                    self._identities[key] = TrackedIdentity(now)
+
+                    entered.append(identity)
+                    should_fire = True
+
+                    continue
+
+                tracked_identity.last_seen = now
+
+                if now - tracked_identity.last_fired >= self._hold_off:
+                    tracked_identity.last_fired = now
+                    should_fire = True
+
+            if not should_fire:
+                self._suppressed[camera_entity_id] = self._suppressed.get(camera_entity_id, 0) + 1
+
+        return entered, should_fire
+
+    def pop_left(self):
+        """Identities not seen for hold_off seconds, list of (camera entity id, event name, identity)."""
+        now = time.monotonic()
+
+        with self._lock:
+            left = [key for key, tracked_identity in self._identities.items()
+                    if now - tracked_identity.last_seen >= self._hold_off]
+
+            for key in left:
+                del self._identities[key]
+
+        return left
+
+    def get_statistics(self, camera_entity_id):
+        with self._lock:
+            present = sorted(set(identity for camera, event_name, identity in self._identities.keys()
+                                 if camera == camera_entity_id))
+
+            result = {
+                ATTR_SUPPRESSED_EVENTS: self._suppressed.get(camera_entity_id, 0),
+                ATTR_PRESENT: present
+            }
+
+        return result
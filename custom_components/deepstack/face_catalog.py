@@ -0,0 +1,97 @@
+import logging
+import threading
+
+from datetime import datetime
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+CHANGE_ADD = 'add'
+CHANGE_REMOVE = 'remove'
+
+
+class FaceCatalog:
+    """Registered faces kept in memory, updated on register / delete and refreshed from DeepStack periodically.
+
+    Changes made while a refresh is in flight are applied again on top of its result,
+    so a register / delete is not lost to a list fetched before it.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._faces = set()
+        self._is_loaded = False
+        self._last_updated = None
+        self._refresh_failures = 0
+        self._changes = []
+        self._lock = threading.Lock()
+
+    @property
+    def faces(self):
+        with self._lock:
+            result = sorted(self._faces)
+
+        return result
+
+    @property
+    def is_loaded(self):
+        return self._is_loaded
+
+    def refresh(self):
+        """Reload the faces from DeepStack, on failure the current faces are kept."""
+        with self._lock:
+            self._changes = []
+
+        faces = self._loader()
+
+        with self._lock:
+            if faces is None:
+                self._refresh_failures += 1
+
+                _LOGGER.warning(f'Failed to refresh the registered faces, keeping {len(self._faces)} known faces')
+
+                return False
+
+            self._faces = set(faces)
+
+            for change, name in self._changes:
+                self._apply(change, name)
+
+            self._changes = []
+            self._is_loaded = True
+            self._last_updated = datetime.now()
+
+        return True
+
+    def add(self, name):
+        self._change(CHANGE_ADD, name)
+
+    def remove(self, name):
+        self._change(CHANGE_REMOVE, name)
+
+    def _change(self, change, name):
+        with self._lock:
+            self._changes.append((change, name))
+
+            self._apply(change, name)
+
+            self._last_updated = datetime.now()
+
+    def _apply(self, change, name):
+        if change == CHANGE_ADD:
+            self._faces.add(name)
+        else:
+            self._faces.discard(name)
+
+    @property
+    def statistics(self):
+        last_updated = None if self._last_updated is None else self._last_updated.isoformat()
+
+        result = {
+            FACES: self.faces,
+            ATTR_LAST_UPDATED: last_updated,
+            ATTR_REFRESH_FAILURES: self._refresh_failures
+        }
+
+        return result
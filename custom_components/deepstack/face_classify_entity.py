@@ -3,10 +3,12 @@ import logging
 import voluptuous as vol
 
 from homeassistant.core import split_entity_id
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.components.image_processing import (ImageProcessingFaceEntity)
 from homeassistant.helpers import config_validation as cv
 
 from .const import *
+from .frame_pipeline import Frame
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,7 +20,8 @@ SERVICE_CHANGE_DETECT_FIRST_SCHEMA = vol.Schema({
 class FaceClassifyEntity(ImageProcessingFaceEntity):
     """Perform a face classification."""
 
-    def __init__(self, hass, data, camera_entity_id, name, detected_first):
+    def __init__(self, hass, data, camera_entity_id, name, detected_first, crop_to_person=False,
+                 crop_padding=DEFAULT_CROP_PADDING):
         """Init with the API key and model id."""
         super().__init__()
 
@@ -31,9 +34,12 @@ class FaceClassifyEntity(ImageProcessingFaceEntity):
         self._matched_faces_description = None
         self._response_time = None
         self._detected_first = detected_first
+        self._crop_to_person = crop_to_person
+        self._crop_padding = crop_padding
         self._last_result = {
             ATTR_CONNECTED: False
         }
+        self._is_active = False
 
         if name:
             self._name = f'{DEEP_STACK_FACE_RECOGNITION} {name}'
@@ -49,15 +55,50 @@ class FaceClassifyEntity(ImageProcessingFaceEntity):
         hass.services.register(DOMAIN, SERVICE_CHANGE_DETECT_FIRST, service_change_detect_first,
                                schema=SERVICE_CHANGE_DETECT_FIRST_SCHEMA)
 
-    def process_image(self, image):
-        """Process an image."""
+    async def async_update(self):
+        """Scan only when the integration is ready and the adaptive scheduler allows it."""
+        if not self._data.is_ready or not self._data.is_scan_due(self._camera_entity_id, OPERATION_RECOGNIZE):
+            return
+
+        self._is_active = False
+
+        with self._data.metrics.measure(STAGE_TOTAL, self._camera_entity_id, OPERATION_RECOGNIZE):
+            frame = await self._data.async_get_frame(self._camera_entity_id, self._async_get_image)
+
+            if frame is not None:
+                await self.async_process_image(frame)
+
+        self._data.report_scan(self._camera_entity_id, OPERATION_RECOGNIZE, self._is_active)
+
+    async def _async_get_image(self):
+        camera = self.hass.components.camera
+
         try:
-            _LOGGER.debug(f'Starting to recognize image of {self._name}')
+            with self._data.metrics.measure(STAGE_FETCH, self._camera_entity_id):
+                image = await camera.async_get_image(self.camera_entity, timeout=self.timeout)
+
+        except HomeAssistantError as err:
+            _LOGGER.error(f'Error on receive image from entity: {err}')
 
-            self._last_result = self._data.recognize(image, self._camera_entity_id, self._name, self._detected_first)
+            return None
 
-            self.total_faces = self._last_result.get(ATTR_TOTAL_MATCHED_FACES, 0)
-            self.faces = self._last_result.get(FACES, [])
+        return image.content
+
+    async def async_process_image(self, image):
+        """Process an image on the event loop."""
+        try:
+            frame = Frame.create(image, self._camera_entity_id)
+
+            if not await self._data.async_is_motion_detected(frame, self._camera_entity_id):
+                return
+
+            _LOGGER.debug('Starting to recognize image of %s', self._name)
+
+            result = await self._data.async_recognize(frame, self._camera_entity_id, self._name,
+                                                      self._detected_first, self._crop_to_person,
+                                                      self._crop_padding)
+
+            self._update_result(result)
 
         except Exception as ex:
             exc_type, exc_obj, tb = sys.exc_info()
@@ -65,6 +106,14 @@ class FaceClassifyEntity(ImageProcessingFaceEntity):
 
             _LOGGER.error(f'Failed to process image ({self._name}), Error: {ex}, Line: {line_number}')
 
+    def _update_result(self, result):
+        self._last_result = result
+
+        self.total_faces = self._last_result.get(ATTR_TOTAL_MATCHED_FACES, 0)
+        self.faces = self._last_result.get(FACES, [])
+
+        self._is_active = len(self.faces) > 0
+
     @property
     def camera_entity(self):
         """Return camera entity id from process pictures."""
@@ -88,4 +137,6 @@ class FaceClassifyEntity(ImageProcessingFaceEntity):
         if self._data.display_response_time:
             attrs[ATTR_RESPONSE_TIME_SEC] = self._last_result.get(ATTR_RESPONSE_TIME_SEC, 0)
 
+        attrs.update(self._data.get_statistics(self._camera_entity_id, OPERATION_RECOGNIZE))
+
         return attrs
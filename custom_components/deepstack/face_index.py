@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FaceIndex:
+    """Face crops of recognized persons, answers repeat recognitions of a person on-box.
+
+    The face of a person crop (at the face box DeepStack returned) is kept as a zero mean, unit length vector of its
+    downscaled gray pixels with the identity and confidence, crops with an unknown face are kept as negatives.
+    A person crop is matched by cropping its face at the average face box of each identity and comparing it to the
+    vectors of the identity by cosine similarity. It matches when the closest identity is known, its similarity is at
+    least similarity and higher by margin than any other identity (unknown included).
+    Until two identities (unknown included) are indexed every crop is recognized by DeepStack.
+    Up to max_per_identity vectors are kept per identity, the oldest is replaced first.
+    Pixel similarity is not an identity signal, lighting and pose dominate it and different persons under the same
+    camera may match, so the index is disabled by default. Only person crops (crop_to_person) are matched.
+    """
+
+    def __init__(self, enabled, similarity=DEFAULT_FACE_INDEX_SIMILARITY, margin=DEFAULT_FACE_INDEX_MARGIN,
+                 max_per_identity=DEFAULT_FACE_INDEX_MAX_PER_IDENTITY):
+        self._enabled = enabled
+        self._similarity = similarity
+        self._margin = margin
+        self._max_per_identity = max_per_identity
+        self._identities = {}
+        self._hits = 0
+        self._misses = 0
+        self._total_match_time = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @staticmethod
+    def get_vector(image, relative_box):
+        """Normalized vector of the face at the box (relative to the image size), None for a blank face."""
+        width, height = image.size
+
+        x_min = int(relative_box[0] * width)
+        y_min = int(relative_box[1] * height)
+        x_max = max(int(relative_box[2] * width), x_min + 1)
+        y_max = max(int(relative_box[3] * height), y_min + 1)
+
+        face_image = image.crop((x_min, y_min, x_max, y_max))
+        small_image = face_image.convert('L').resize((FACE_INDEX_VECTOR_SIZE, FACE_INDEX_VECTOR_SIZE))
+
+        vector = np.asarray(small_image, dtype=np.float32).ravel()
+        vector = vector - vector.mean()
+
+        norm = np.linalg.norm(vector)
+
+        if norm == 0:
+            return None
+
+        result = vector / norm
+
+        return result
+
+    def match(self, image):
+        """Identity of the person crop, returns (identity, confidence, relative face box) or None on a miss.
+
+        The confidence is the lower of the confidence DeepStack returned and the similarity of the match.
+        """
+        start_time = time.perf_counter()
+
+        with self._lock:
+            identities = dict(self._identities)
+
+        scores = []
+
+        if len(identities) >= 2:
+            for identity, (vectors, confidences, relative_boxes) in identities.items():
+                relative_box = tuple(float(value) for value in np.mean(relative_boxes, axis=0))
+                vector = self.get_vector(image, relative_box)
+
+                if vector is None:
+                    continue
+
+                similarities = vectors @ vector
+                best_index = int(np.argmax(similarities))
+
+                scores.append((float(similarities[best_index]), identity, confidences[best_index], relative_box))
+
+        scores.sort(reverse=True)
+
+        result = None
+
+        if len(scores) >= 2:
+            similarity, identity, confidence, relative_box = scores[0]
+            other_similarity = scores[1][0]
+
+            is_match = identity != UNKNOWN and similarity >= self._similarity and \
+                similarity - other_similarity >= self._margin
+
+            if is_match:
+                result = identity, min(confidence, similarity), relative_box
+
+        with self._lock:
+            if result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+            self._total_match_time += time.perf_counter() - start_time
+
+        return result
+
+    def add(self, image, identity, confidence, relative_box):
+        """Index the face of a person crop, unknown faces are indexed as negatives."""
+        vector = self.get_vector(image, relative_box)
+
+        if vector is None:
+            return
+
+        with self._lock:
+            vectors, confidences, relative_boxes = self._identities.get(identity, (None, [], []))
+
+            vectors = vector[np.newaxis, :] if vectors is None else np.vstack([vectors, vector[np.newaxis, :]])
+            confidences = confidences + [confidence]
+            relative_boxes = relative_boxes + [relative_box]
+
+            if len(confidences) > self._max_per_identity:
+                vectors = vectors[1:]
+                confidences = confidences[1:]
+                relative_boxes = relative_boxes[1:]
+
+            self._identities[identity] = (vectors, confidences, relative_boxes)
+
+    def remove(self, identity):
+        """Forget the faces of the identity, its faces were registered again or deleted."""
+        with self._lock:
+            self._identities.pop(identity, None)
+
+    def retain(self, identities):
+        """Keep only the faces of the registered identities and the unknown faces."""
+        identities = set(identities)
+        identities.add(UNKNOWN)
+
+        with self._lock:
+            removed = [identity for identity in self._identities.keys() if identity not in identities]
+
+            for identity in removed:
+                del self._identities[identity]
+
+        if len(removed) > 0:
+            _LOGGER.debug('Removing faces of %s from the face index', ', '.join(removed))
+
+    @property
+    def statistics(self):
+        result = {}
+
+        if self._enabled:
+            with self._lock:
+                matches = self._hits + self._misses
+
+                hit_rate = None
+                average_match_time = None
+
+                if matches > 0:
+                    hit_rate = round(self._hits / matches, 2)
+                    average_match_time = round(self._total_match_time / matches * 1000, 3)
+
+                result = {
+                    ATTR_FACE_INDEX_SIZE: sum(len(item[1]) for item in self._identities.values()),
+                    ATTR_FACE_INDEX_HITS: self._hits,
+                    ATTR_FACE_INDEX_MISSES: self._misses,
+                    ATTR_FACE_INDEX_HIT_RATE: hit_rate,
+                    ATTR_FACE_INDEX_MATCH_TIME: average_match_time
+                }
+
+        return result
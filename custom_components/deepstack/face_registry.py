@@ -0,0 +1,59 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FaceRegistry:
+    """Content hashes of the registered face images, persisted so an image is not uploaded twice."""
+
+    def __init__(self, file_path):
+        self._file_path = file_path
+        self._digests = {}
+        self._lock = threading.Lock()
+
+        self.load()
+
+    @staticmethod
+    def get_digest(content):
+        return hashlib.sha1(content).hexdigest()
+
+    def load(self):
+        try:
+            if os.path.exists(self._file_path):
+                with open(self._file_path) as registry_file:
+                    self._digests = json.load(registry_file)
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to load registered faces from: {self._file_path}, Error: {ex}')
+
+            self._digests = {}
+
+    def save(self):
+        with self._lock:
+            digests = dict(self._digests)
+
+        try:
+            with open(self._file_path, 'w') as registry_file:
+                json.dump(digests, registry_file)
+
+        except Exception as ex:
+            _LOGGER.error(f'Failed to store registered faces to: {self._file_path}, Error: {ex}')
+
+    def is_registered(self, digest, name):
+        with self._lock:
+            result = self._digests.get(digest) == name
+
+        return result
+
+    def add(self, digest, name):
+        with self._lock:
+            self._digests[digest] = name
+
+    def remove(self, name):
+        """Forget the images of a deleted face, they will be uploaded again when registered."""
+        with self._lock:
+            self._digests = {digest: item for digest, item in self._digests.items() if item != name}
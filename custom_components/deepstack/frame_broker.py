@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+
+from .const import *
+from .frame_pipeline import Frame
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FrameBroker:
+    """Fetches the frame of a camera once per tick and shares it between the processors of the camera.
+
+    A frame fetched less than max_age seconds ago is reused, a processor scanning while the frame is being fetched
+    waits for it. The shared Frame decodes / hashes its content once for all the processors.
+    The frame (and its decoded image) is released once every processor of the camera got it, or when the tick is
+    over for processors that skipped it (adaptive scan, idle cameras).
+    Must be called from the event loop.
+    """
+
+    def __init__(self):
+        self._max_ages = {}
+        self._consumers = {}
+        self._frames = {}
+        self._pending = {}
+        self._shared_frames = {}
+
+    def register(self, camera_entity_id, max_age):
+        """Register a processor of the camera, the shortest scan interval of its processors defines its tick."""
+        current_max_age = self._max_ages.get(camera_entity_id)
+
+        if current_max_age is None or max_age < current_max_age:
+            self._max_ages[camera_entity_id] = max_age
+
+        self._consumers[camera_entity_id] = self._consumers.get(camera_entity_id, 0) + 1
+
+    async def async_get_frame(self, camera_entity_id, fetch):
+        """Frame of the current tick, fetch is called when there is none, None when the fetch failed."""
+        frame = self._get_current_frame(camera_entity_id)
+
+        if frame is not None:
+            self._count_shared_frame(camera_entity_id, frame)
+
+            return frame
+
+        pending = self._pending.get(camera_entity_id)
+
+        if pending is not None:
+            frame = await asyncio.shield(pending)
+
+            if frame is not None:
+                self._count_shared_frame(camera_entity_id, frame)
+
+            return frame
+
+        pending = asyncio.get_running_loop().create_future()
+        self._pending[camera_entity_id] = pending
+
+        frame = None
+
+        try:
+            content = await fetch()
+
+            if content is not None:
+                frame = Frame(content, camera_entity_id)
+
+                self._store(camera_entity_id, frame)
+
+        finally:
+            del self._pending[camera_entity_id]
+
+            pending.set_result(frame)
+
+        return frame
+
+    def _store(self, camera_entity_id, frame):
+        """Keep the frame for the other processors of the camera until the end of the tick."""
+        max_age = self._max_ages.get(camera_entity_id, 0) * FRAME_BROKER_TICK_RATIO
+        remaining = self._consumers.get(camera_entity_id, 1) - 1
+
+        if remaining <= 0 or max_age <= 0:
+            return
+
+        expiry = asyncio.get_running_loop().call_later(max_age, self._release, camera_entity_id, frame)
+
+        self._frames[camera_entity_id] = (frame, time.monotonic(), remaining, expiry)
+
+    def _release(self, camera_entity_id, frame):
+        """Release the content and decoded image of the frame unless it was replaced already."""
+        current_frame, fetched_at, remaining, expiry = self._frames.get(camera_entity_id, (None, None, 0, None))
+
+        if current_frame is frame:
+            del self._frames[camera_entity_id]
+
+            expiry.cancel()
+
+    def _get_current_frame(self, camera_entity_id):
+        frame, fetched_at, remaining, expiry = self._frames.get(camera_entity_id, (None, None, 0, None))
+
+        if frame is None:
+            return None
+
+        max_age = self._max_ages.get(camera_entity_id, 0) * FRAME_BROKER_TICK_RATIO
+
+        if time.monotonic() - fetched_at >= max_age:
+            self._release(camera_entity_id, frame)
+
+            return None
+
+        return frame
+
+    def _count_shared_frame(self, camera_entity_id, frame):
+        current_frame, fetched_at, remaining, expiry = self._frames.get(camera_entity_id, (None, None, 0, None))
+
+        if current_frame is frame:
+            if remaining <= 1:
+                # Every processor of the camera got the frame of this tick
+                self._release(camera_entity_id, frame)
+            else:
+                self._frames[camera_entity_id] = (frame, fetched_at, remaining - 1, expiry)
+
+        self._shared_frames[camera_entity_id] = self._shared_frames.get(camera_entity_id, 0) + 1
+
+        _LOGGER.debug('Sharing frame of %s', camera_entity_id)
+
+    def get_statistics(self, camera_entity_id):
+        result = {
+            ATTR_SHARED_FRAMES: self._shared_frames.get(camera_entity_id, 0)
+        }
+
+        return result
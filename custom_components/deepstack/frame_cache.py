@@ -0,0 +1,78 @@
+import copy
+import logging
+import threading
+import time
+
+from . import image_utils
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FrameCache:
+    """Returns the last predictions of a camera while its frames stay visually the same."""
+
+    def __init__(self, enabled, threshold, ttl):
+        self._enabled = enabled
+        self._threshold = threshold
+        self._ttl = ttl
+        self._entries = {}
+        self._hits = {}
+        self._misses = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def get(self, frame, operation):
+        """Cached predictions of a similar frame of the same camera, None on a miss."""
+        if not self._enabled:
+            return None
+
+        result = None
+
+        try:
+            perceptual_hash = frame.perceptual_hash
+            key = (frame.camera_entity_id, operation)
+
+            with self._lock:
+                entry = self._entries.get(key)
+
+                if entry is not None:
+                    cached_hash, cached_time, predictions = entry
+
+                    is_fresh = time.monotonic() - cached_time < self._ttl
+                    is_similar = image_utils.get_hash_distance(perceptual_hash, cached_hash) <= self._threshold
+
+                    if is_fresh and is_similar:
+                        result = copy.deepcopy(predictions)
+
+                counters = self._misses if result is None else self._hits
+                counters[frame.camera_entity_id] = counters.get(frame.camera_entity_id, 0) + 1
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to look up frame cache of {frame.camera_entity_id}, Error: {ex}')
+
+        return result
+
+    def set(self, frame, operation, predictions):
+        if not self._enabled:
+            return
+
+        try:
+            key = (frame.camera_entity_id, operation)
+
+            with self._lock:
+                self._entries[key] = (frame.perceptual_hash, time.monotonic(), copy.deepcopy(predictions))
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to store frame cache of {frame.camera_entity_id}, Error: {ex}')
+
+    def get_statistics(self, camera_entity_id):
+        result = {
+            ATTR_CACHE_HITS: self._hits.get(camera_entity_id, 0),
+            ATTR_CACHE_MISSES: self._misses.get(camera_entity_id, 0)
+        }
+
+        return result
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import logging
+
+from . import image_utils
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Frame:
+    """Single camera frame, hashed once and shared by every processing step."""
+
+    def __init__(self, content, camera_entity_id):
+        self._content = content
+        self._camera_entity_id = camera_entity_id
+        self._digest = None
+        self._image = None
+        self._perceptual_hash = None
+
+    @staticmethod
+    def create(image, camera_entity_id):
+        if isinstance(image, Frame):
+            return image
+
+        return Frame(image, camera_entity_id)
+
+    @property
+    def content(self):
+        return self._content
+
+    @property
+    def camera_entity_id(self):
+        return self._camera_entity_id
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha1(self._content).hexdigest()
+
+        return self._digest
+
+    @property
+    def image(self):
+        """Decoded image, decoding is done on first access only."""
+        if self._image is None:
+            self._image = image_utils.decode(self._content)
+
+        return self._image
+
+    @property
+    def perceptual_hash(self):
+        if self._perceptual_hash is None:
+            self._perceptual_hash = image_utils.get_perceptual_hash(self.image)
+
+        return self._perceptual_hash
+
+
+class FramePipeline:
+    """Shares the detection of a frame between the processors of the same camera."""
+
+    def __init__(self):
+        self._detections = {}
+        self._async_locks = {}
+        self._shared_detections = {}
+
+    def async_lock(self, camera_entity_id):
+        """Must be called from the event loop."""
+        if camera_entity_id not in self._async_locks:
+            self._async_locks[camera_entity_id] = asyncio.Lock()
+
+        return self._async_locks[camera_entity_id]
+
+    def get_detection(self, frame):
+        digest, predictions = self._detections.get(frame.camera_entity_id, (None, None))
+
+        if digest != frame.digest:
+            return None
+
+        self._shared_detections[frame.camera_entity_id] = self.get_shared_detections(frame.camera_entity_id) + 1
+
+        _LOGGER.debug('Reusing detection of frame %s for %s', digest, frame.camera_entity_id)
+
+        return predictions
+
+    def set_detection(self, frame, predictions):
+        self._detections[frame.camera_entity_id] = (frame.digest, predictions)
+
+    def get_shared_detections(self, camera_entity_id):
+        return self._shared_detections.get(camera_entity_id, 0)
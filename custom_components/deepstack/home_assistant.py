@@ -1,23 +1,110 @@
 import logging
+import aiohttp
 import voluptuous as vol
 
-from homeassistant.const import (CONF_HOST, CONF_PORT, ATTR_NAME, CONF_SSL)
+from homeassistant.const import (CONF_HOST, CONF_PORT, ATTR_NAME, CONF_SSL, EVENT_HOMEASSISTANT_STOP)
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import track_time_interval
 from homeassistant.components.image_processing import (CONF_CONFIDENCE)
 
 from .const import *
 
 _LOGGER = logging.getLogger(__name__)
 
+FRAME_CACHE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_THRESHOLD, default=DEFAULT_FRAME_CACHE_THRESHOLD): vol.All(vol.Coerce(int),
+                                                                                vol.Range(min=0, max=64)),
+    vol.Optional(CONF_TTL, default=DEFAULT_FRAME_CACHE_TTL): cv.positive_int
+})
+
+ADAPTIVE_SCAN_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_MAX_INTERVAL, default=DEFAULT_MAX_SCAN_INTERVAL): cv.positive_int,
+    vol.Optional(CONF_REQUESTS_PER_SECOND, default=DEFAULT_REQUESTS_PER_SECOND): vol.All(vol.Coerce(float),
+                                                                                        vol.Range(min=0))
+})
+
+BACKEND_SCHEMA = vol.Schema({
+    vol.Required(CONF_HOST): cv.string,
+    vol.Optional(CONF_SSL, default=False): cv.boolean,
+    vol.Required(CONF_PORT): cv.port
+})
+
+CIRCUIT_BREAKER_SCHEMA = vol.Schema({
+    vol.Optional(CONF_FAILURES, default=DEFAULT_CIRCUIT_BREAKER_FAILURES): cv.positive_int,
+    vol.Optional(CONF_COOLDOWN, default=DEFAULT_CIRCUIT_BREAKER_COOLDOWN): cv.positive_int
+})
+
+PREPROCESSING_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_DETECTION_MAX_SIZE, default=DEFAULT_DETECTION_MAX_SIZE): cv.positive_int,
+    vol.Optional(CONF_RECOGNITION_MAX_SIZE, default=DEFAULT_RECOGNITION_MAX_SIZE): cv.positive_int,
+    vol.Optional(CONF_JPEG_QUALITY, default=DEFAULT_JPEG_QUALITY): vol.All(vol.Coerce(int), vol.Range(min=1, max=100))
+})
+
+UNKNOWN_FACES_STORAGE_SCHEMA = vol.Schema({
+    vol.Optional(CONF_CROP_FACES, default=False): cv.boolean,
+    vol.Optional(CONF_QUEUE_SIZE, default=DEFAULT_SNAPSHOT_QUEUE_SIZE): cv.positive_int,
+    vol.Optional(CONF_DEDUPE_THRESHOLD, default=DEFAULT_SNAPSHOT_DEDUPE_THRESHOLD): vol.All(vol.Coerce(int),
+                                                                                          vol.Range(min=0, max=64)),
+    vol.Optional(CONF_MAX_FILES, default=DEFAULT_SNAPSHOT_MAX_FILES): cv.positive_int,
+    vol.Optional(CONF_MAX_SIZE, default=DEFAULT_SNAPSHOT_MAX_SIZE): cv.positive_int,
+    vol.Optional(CONF_MAX_AGE, default=DEFAULT_SNAPSHOT_MAX_AGE): cv.positive_int
+})
+
+EVENT_COALESCING_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_HOLD_OFF, default=DEFAULT_EVENT_HOLD_OFF): cv.positive_int
+})
+
+TRACKING_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_IOU_THRESHOLD, default=DEFAULT_TRACKING_IOU_THRESHOLD): vol.All(vol.Coerce(float),
+                                                                                     vol.Range(min=0, max=1)),
+    vol.Optional(CONF_MAX_AGE, default=DEFAULT_TRACKING_MAX_AGE): cv.positive_int,
+    vol.Optional(CONF_REFRESH_INTERVAL, default=DEFAULT_TRACKING_REFRESH_INTERVAL): cv.positive_int
+})
+
+BATCHING_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_WINDOW, default=DEFAULT_BATCH_WINDOW): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+    vol.Optional(CONF_MAX_BATCH_SIZE, default=DEFAULT_MAX_BATCH_SIZE): vol.All(vol.Coerce(int),
+                                                                              vol.Range(min=2, max=16)),
+    vol.Optional(CONF_TILE_SIZE, default=DEFAULT_BATCH_TILE_SIZE): cv.positive_int
+})
+
+FACE_INDEX_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENABLED, default=False): cv.boolean,
+    vol.Optional(CONF_SIMILARITY, default=DEFAULT_FACE_INDEX_SIMILARITY): vol.All(vol.Coerce(float),
+                                                                                 vol.Range(min=0, max=1)),
+    vol.Optional(CONF_MARGIN, default=DEFAULT_FACE_INDEX_MARGIN): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+    vol.Optional(CONF_MAX_PER_IDENTITY, default=DEFAULT_FACE_INDEX_MAX_PER_IDENTITY): cv.positive_int
+})
+
 CONFIG_SCHEMA = vol.Schema({
-    DOMAIN: vol.Schema({
-        vol.Required(CONF_HOST): cv.string,
+    DOMAIN: vol.All(vol.Schema({
+        vol.Inclusive(CONF_HOST, CONF_HOST): cv.string,
         vol.Optional(CONF_SSL): cv.boolean,
-        vol.Required(CONF_PORT): cv.port,
+        vol.Inclusive(CONF_PORT, CONF_HOST): cv.port,
+        vol.Optional(CONF_BACKENDS): vol.All(cv.ensure_list, [BACKEND_SCHEMA], vol.Length(min=1)),
         vol.Optional(CONF_UNKNOWN_DIRECTORY): cv.string,
+        vol.Optional(CONF_UNKNOWN_FACES_STORAGE): UNKNOWN_FACES_STORAGE_SCHEMA,
         vol.Optional(CONF_ADMIN_KEY, default=''): cv.string,
-        vol.Optional(CONF_API_KEY, default=''): cv.string
-    }),
+        vol.Optional(CONF_API_KEY, default=''): cv.string,
+        vol.Optional(CONF_POOL_SIZE, default=DEFAULT_POOL_SIZE): cv.positive_int,
+        vol.Optional(CONF_MAX_CONCURRENT_REQUESTS, default=DEFAULT_MAX_CONCURRENT_REQUESTS): cv.positive_int,
+        vol.Optional(CONF_FRAME_CACHE): FRAME_CACHE_SCHEMA,
+        vol.Optional(CONF_ADAPTIVE_SCAN): ADAPTIVE_SCAN_SCHEMA,
+        vol.Optional(CONF_CIRCUIT_BREAKER): CIRCUIT_BREAKER_SCHEMA,
+        vol.Optional(CONF_PREPROCESSING): PREPROCESSING_SCHEMA,
+        vol.Optional(CONF_EVENT_COALESCING): EVENT_COALESCING_SCHEMA,
+        vol.Optional(CONF_TRACKING): TRACKING_SCHEMA,
+        vol.Optional(CONF_BATCHING): BATCHING_SCHEMA,
+        vol.Optional(CONF_FACE_INDEX): FACE_INDEX_SCHEMA,
+        vol.Optional(CONF_FACE_CATALOG_TTL, default=DEFAULT_FACE_CATALOG_TTL): cv.positive_int,
+        vol.Optional(CONF_BACKUP_KEEP, default=DEFAULT_BACKUP_KEEP): cv.positive_int
+    }), cv.has_at_least_one_key(CONF_HOST, CONF_BACKENDS)),
 }, extra=vol.ALLOW_EXTRA)
 
 SERVICE_REGISTER_FACE_SCHEMA = vol.Schema({
@@ -25,6 +112,17 @@ SERVICE_REGISTER_FACE_SCHEMA = vol.Schema({
     vol.Required(FILE_PATH): cv.string,
 })
 
+SERVICE_REGISTER_FACES_BULK_SCHEMA = vol.Schema({
+    vol.Required(ATTR_DIRECTORY): cv.string,
+    vol.Optional(ATTR_MAX_PARALLEL, default=DEFAULT_BULK_REGISTRATION_PARALLELISM): vol.All(vol.Coerce(int),
+                                                                                           vol.Range(min=1, max=16))
+})
+
+SERVICE_RESTORE_SCHEMA = vol.Schema({
+    vol.Optional(FILE_PATH): cv.string,
+    vol.Optional(ATTR_ALLOW_UNVERIFIED, default=False): cv.boolean
+})
+
 SERVICE_DELETE_FACE_SCHEMA = vol.Schema({
     vol.Required(ATTR_NAME): cv.string
 })
@@ -33,6 +131,10 @@ SERVICE_DISPLAY_RESPONSE_TIME_SCHEMA = vol.Schema({
     vol.Required(ATTR_ENABLED): cv.boolean,
 })
 
+SERVICE_TRACE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+})
+
 SERVICE_CHANGE_CONFIDENCE_LEVEL_SCHEMA = vol.Schema({
     vol.Required(CONF_CONFIDENCE): vol.All(vol.Coerce(float), vol.Range(min=0, max=100))
 })
@@ -44,7 +146,8 @@ class HomeAssistant:
         self._allow_backup_restore = allow_backup_restore
 
     def initialize(self, service_change_confidence_level, service_display_response_time,
-                   service_register_face, service_list_faces, service_delete_face):
+                   service_register_face, service_list_faces, service_delete_face, service_dump_metrics,
+                   service_register_faces_bulk, service_backup, service_restore, service_trace):
         self._hass.services.register(DOMAIN, SERVICE_CHANGE_CONFIDENCE_LEVEL, service_change_confidence_level,
                                      schema=SERVICE_CHANGE_CONFIDENCE_LEVEL_SCHEMA)
 
@@ -54,10 +157,19 @@ class HomeAssistant:
         self._hass.services.register(DOMAIN, SERVICE_REGISTER_FACE, service_register_face,
                                      schema=SERVICE_REGISTER_FACE_SCHEMA)
 
+        self._hass.services.register(DOMAIN, SERVICE_REGISTER_FACES_BULK, service_register_faces_bulk,
+                                     schema=SERVICE_REGISTER_FACES_BULK_SCHEMA)
+
+        self._hass.services.register(DOMAIN, SERVICE_DUMP_METRICS, service_dump_metrics)
+
+        self._hass.services.register(DOMAIN, SERVICE_TRACE, service_trace, schema=SERVICE_TRACE_SCHEMA)
+
         if self._allow_backup_restore:
             self._hass.services.register(DOMAIN, SERVICE_LIST_FACES, service_list_faces)
             self._hass.services.register(DOMAIN, SERVICE_DELETE_FACE, service_delete_face,
                                          schema=SERVICE_DELETE_FACE_SCHEMA)
+            self._hass.services.register(DOMAIN, SERVICE_BACKUP, service_backup)
+            self._hass.services.register(DOMAIN, SERVICE_RESTORE, service_restore, schema=SERVICE_RESTORE_SCHEMA)
 
     def is_valid_file_path(self, file_path):
         """Check that a file_path points to a valid file."""
@@ -86,10 +198,33 @@ class HomeAssistant:
         return result
 
     def fire_event(self, name, data):
-        _LOGGER.info(f'Firing event: {name} with the following data: {data}')
+        _LOGGER.debug('Firing event: %s with the following data: %s', name, data)
 
         self._hass.async_add_job(self._hass.bus.async_fire, name, data)
 
+    def create_client_session(self, pool_size, trace_configs=None):
+        """aiohttp session keeping up to pool_size connections alive, closed on stop, called from the event loop."""
+        connector = aiohttp.TCPConnector(limit=pool_size, enable_cleanup_closed=True)
+        session = aiohttp.ClientSession(connector=connector, trace_configs=trace_configs)
+
+        async def async_close(event):
+            await session.close()
+
+        self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_close)
+
+        return session
+
+    async def async_run_in_executor(self, target, *args):
+        result = await self._hass.async_add_executor_job(target, *args)
+
+        return result
+
+    def track_time_interval(self, action, interval):
+        track_time_interval(self._hass, action, interval)
+
+    def listen_stop(self, callback):
+        self._hass.bus.listen_once(EVENT_HOMEASSISTANT_STOP, callback)
+
     def path_builder(self, file_name):
         path = self._hass.config.path(file_name)
 
@@ -21,16 +21,42 @@ DEPENDENCIES = [DOMAIN]
 FACE_RECOGNITION_SCHEMA = vol.Schema({
     vol.Required(ATTR_ENABLED): cv.boolean,
     vol.Optional(CONF_DETECT_FIRST, default=False): cv.boolean,
+    vol.Optional(CONF_CROP_TO_PERSON, default=False): cv.boolean,
+    vol.Optional(CONF_CROP_PADDING, default=DEFAULT_CROP_PADDING): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
 })
 
+TARGET_FILTER_SCHEMA = vol.Schema({
+    vol.Optional(CONF_MIN_CONFIDENCE, default=DEFAULT_MIN_CONFIDENCE): vol.All(vol.Coerce(float),
+                                                                              vol.Range(min=0, max=1)),
+    vol.Optional(CONF_MIN_AREA, default=DEFAULT_MIN_AREA): cv.positive_int
+})
+
+ZONE_SCHEMA = vol.All(cv.ensure_list, [vol.ExactSequence([vol.Coerce(float), vol.Coerce(float)])], vol.Length(min=3))
+
 OBJECT_DETECTION_SCHEMA = vol.Schema({
     vol.Required(ATTR_ENABLED): cv.boolean,
-    vol.Optional(CONF_TARGETS, default=[TARGET_PERSON]): vol.All(cv.ensure_list, [vol.In(SUPPORTED_TARGETS)])
+    vol.Optional(CONF_TARGETS, default=[TARGET_PERSON]): vol.All(cv.ensure_list, [vol.In(SUPPORTED_TARGETS)]),
+    vol.Optional(CONF_TARGET_FILTERS, default={}): {
+        vol.In(SUPPORTED_TARGETS): TARGET_FILTER_SCHEMA
+    },
+    vol.Optional(CONF_ZONES, default={}): {
+        cv.entity_id: vol.All(cv.ensure_list, [ZONE_SCHEMA])
+    },
+    vol.Optional(CONF_CROP_TO_ZONES, default=False): cv.boolean
+})
+
+MOTION_FILTER_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENABLED): cv.boolean,
+    vol.Optional(CONF_THRESHOLD, default=DEFAULT_MOTION_THRESHOLD): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+    vol.Optional(CONF_CAMERA_THRESHOLDS, default={}): {
+        cv.entity_id: vol.All(vol.Coerce(float), vol.Range(min=0, max=1))
+    }
 })
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_FACE_RECOGNITION): FACE_RECOGNITION_SCHEMA,
-    vol.Optional(CONF_OBJECT_DETECTION): OBJECT_DETECTION_SCHEMA
+    vol.Optional(CONF_OBJECT_DETECTION): OBJECT_DETECTION_SCHEMA,
+    vol.Optional(CONF_MOTION_FILTER): MOTION_FILTER_SCHEMA
 })
 
 
@@ -42,15 +68,33 @@ def setup_platform(hass, config, add_devices, discovery_info=None):
     face_recognition = config.get(CONF_FACE_RECOGNITION, {})
     allow_face_recognition = face_recognition.get(ATTR_ENABLED, False)
     detect_first = face_recognition.get(CONF_DETECT_FIRST, False)
+    crop_to_person = face_recognition.get(CONF_CROP_TO_PERSON, False)
+    crop_padding = face_recognition.get(CONF_CROP_PADDING, DEFAULT_CROP_PADDING)
 
     object_detection = config.get(CONF_OBJECT_DETECTION, {})
     allow_object_detection = object_detection.get(ATTR_ENABLED, False)
     object_detection_targets = object_detection.get(CONF_TARGETS, [TARGET_PERSON])
+    object_detection_target_filters = object_detection.get(CONF_TARGET_FILTERS, {})
+    object_detection_zones = object_detection.get(CONF_ZONES, {})
+    crop_to_zones = object_detection.get(CONF_CROP_TO_ZONES, False)
+
+    motion_filter = config.get(CONF_MOTION_FILTER, {})
+    allow_motion_filter = motion_filter.get(ATTR_ENABLED, False)
+    motion_threshold = motion_filter.get(CONF_THRESHOLD, DEFAULT_MOTION_THRESHOLD)
+    motion_camera_thresholds = motion_filter.get(CONF_CAMERA_THRESHOLDS, {})
 
     _LOGGER.info(f'Initializing with following configuration: {config}, discovery_info: {discovery_info}')
 
+    if allow_face_recognition and crop_to_person and not detect_first:
+        _LOGGER.warning(f'{CONF_CROP_TO_PERSON} requires {CONF_DETECT_FIRST}, faces are recognized in whole frames '
+                        f'until {CONF_DETECT_FIRST} is enabled')
+
     data = hass.data[DATA_DEEP_STACK]
 
+    if allow_face_recognition and data.face_index_enabled and not crop_to_person:
+        _LOGGER.warning(f'Face index is used only with {CONF_CROP_TO_PERSON}, faces of these cameras are always '
+                        f'recognized by DeepStack')
+
     timeout = scan_interval.total_seconds()
 
     if allow_face_recognition and detect_first:
@@ -64,14 +108,33 @@ def setup_platform(hass, config, add_devices, discovery_info=None):
         camera_name = camera.get(CONF_NAME)
         camera_entity_id = camera.get(CONF_ENTITY_ID)
 
+        if allow_motion_filter:
+            data.set_motion_threshold(camera_entity_id, motion_camera_thresholds.get(camera_entity_id,
+                                                                                     motion_threshold))
+
         if allow_face_recognition:
-            face_entity = FaceClassifyEntity(hass, data, camera_entity_id, camera_name, detect_first)
+            face_entity = FaceClassifyEntity(hass, data, camera_entity_id, camera_name, detect_first, crop_to_person,
+                                             crop_padding)
 
             data.add_processor(face_entity)
+            data.register_scan(camera_entity_id, OPERATION_RECOGNIZE, scan_interval.total_seconds())
 
         if allow_object_detection:
+            camera_crop_to_zones = crop_to_zones
+
+            # The detection of a frame is shared with the person check of the face recognition (detect_first can be
+            # enabled by a service at any time), a cropped frame would hide the persons outside of the zones
+            if crop_to_zones and allow_face_recognition:
+                _LOGGER.warning(f'crop_to_zones is ignored for {camera_entity_id}, face recognition needs whole frames')
+
+                camera_crop_to_zones = False
+
+            data.set_object_filters(camera_entity_id, object_detection_zones.get(camera_entity_id, []),
+                                    object_detection_target_filters, camera_crop_to_zones)
+
             face_entity = ObjectClassifyEntity(hass, data, camera_entity_id, camera_name, object_detection_targets)
 
             data.add_processor(face_entity)
+            data.register_scan(camera_entity_id, OPERATION_DETECT, scan_interval.total_seconds())
 
     add_devices(data.processors)
@@ -0,0 +1,230 @@
+import io
+import math
+import logging
+
+from PIL import Image
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def decode(content):
+    image = Image.open(io.BytesIO(content))
+    image.load()
+
+    return image
+
+
+def encode(image, quality=DEFAULT_JPEG_QUALITY):
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+
+    return buffer.getvalue()
+
+
+def create_blank_image(size):
+    content = encode(Image.new('RGB', size))
+
+    return content
+
+
+def get_perceptual_hash(image, hash_size=PERCEPTUAL_HASH_SIZE):
+    """Difference hash of the downscaled gray image, similar frames get close hashes."""
+    small_image = image.convert('L').resize((hash_size + 1, hash_size))
+    pixels = list(small_image.getdata())
+
+    result = 0
+
+    for row in range(hash_size):
+        row_start = row * (hash_size + 1)
+
+        for column in range(hash_size):
+            is_brighter = pixels[row_start + column] > pixels[row_start + column + 1]
+
+            result = (result << 1) | int(is_brighter)
+
+    return result
+
+
+def get_hash_distance(perceptual_hash, other_perceptual_hash):
+    result = bin(perceptual_hash ^ other_perceptual_hash).count('1')
+
+    return result
+
+
+def get_box(prediction):
+    box = (prediction.get(X_MIN, 0), prediction.get(Y_MIN, 0), prediction.get(X_MAX, 0), prediction.get(Y_MAX, 0))
+
+    return box
+
+
+def pad_box(box, padding, width, height):
+    """Grow a box by a fraction of its size on every side, clipped to the image."""
+    x_min, y_min, x_max, y_max = box
+
+    pad_x = int((x_max - x_min) * padding)
+    pad_y = int((y_max - y_min) * padding)
+
+    padded_box = (max(x_min - pad_x, 0), max(y_min - pad_y, 0), min(x_max + pad_x, width), min(y_max + pad_y, height))
+
+    return padded_box
+
+
+def is_overlapping(box, other_box):
+    result = box[0] < other_box[2] and other_box[0] < box[2] and box[1] < other_box[3] and other_box[1] < box[3]
+
+    return result
+
+
+def get_iou(box, other_box):
+    """Intersection over union of two boxes, 0 - disjoint, 1 - the same box."""
+    width = min(box[2], other_box[2]) - max(box[0], other_box[0])
+    height = min(box[3], other_box[3]) - max(box[1], other_box[1])
+
+    if width <= 0 or height <= 0:
+        return 0
+
+    intersection = width * height
+    union = (box[2] - box[0]) * (box[3] - box[1]) + (other_box[2] - other_box[0]) * (other_box[3] - other_box[1])
+
+    result = intersection / (union - intersection)
+
+    return result
+
+
+def is_center_inside(box, other_box):
+    """Whether the center of box is within other_box."""
+    x_center = (box[0] + box[2]) / 2
+    y_center = (box[1] + box[3]) / 2
+
+    result = other_box[0] <= x_center <= other_box[2] and other_box[1] <= y_center <= other_box[3]
+
+    return result
+
+
+def merge_boxes(boxes):
+    """Union overlapping boxes so the same area is never sent twice."""
+    merged = []
+
+    for box in boxes:
+        current = box
+        overlapping = [merged_box for merged_box in merged if is_overlapping(current, merged_box)]
+
+        while len(overlapping) > 0:
+            for merged_box in overlapping:
+                merged.remove(merged_box)
+
+                current = (min(current[0], merged_box[0]), min(current[1], merged_box[1]),
+                           max(current[2], merged_box[2]), max(current[3], merged_box[3]))
+
+            overlapping = [merged_box for merged_box in merged if is_overlapping(current, merged_box)]
+
+        merged.append(current)
+
+    return merged
+
+
+def crop_regions(image, predictions, padding):
+    """Crop the padded boxes of the predictions, returns list of (image, x offset, y offset)."""
+    width, height = image.size
+
+    boxes = [pad_box(get_box(prediction), padding, width, height) for prediction in predictions]
+
+    regions = [(image.crop(box), box[0], box[1]) for box in merge_boxes(boxes)]
+
+    return regions
+
+
+def resize_to_fit(image, max_size):
+    """Downscale the image so its larger dimension is up to max_size, returns (image, original / resized)."""
+    width, height = image.size
+    larger_dimension = max(width, height)
+
+    if max_size is None or larger_dimension <= max_size:
+        return image, 1
+
+    scale = larger_dimension / max_size
+
+    resized_image = image.resize((max(int(width / scale), 1), max(int(height / scale), 1)), Image.BILINEAR)
+
+    return resized_image, scale
+
+
+def scale_predictions(predictions, scale):
+    """Map the boxes of predictions made on a resized image back to the original resolution."""
+    if scale == 1:
+        return predictions
+
+    for prediction in predictions:
+        for key in [X_MIN, Y_MIN, X_MAX, Y_MAX]:
+            if key in prediction:
+                prediction[key] = int(round(prediction[key] * scale))
+
+    return predictions
+
+
+def offset_predictions(predictions, x_offset, y_offset):
+    """Map the boxes of predictions made on a crop back to the frame coordinates."""
+    for prediction in predictions:
+        for key in [X_MIN, X_MAX]:
+            if key in prediction:
+                prediction[key] = prediction[key] + x_offset
+
+        for key in [Y_MIN, Y_MAX]:
+            if key in prediction:
+                prediction[key] = prediction[key] + y_offset
+
+    return predictions
+
+
+def create_mosaic(images, tile_size):
+    """Tile the images into a grid of tile_size squares, returns (mosaic, list of (x, y, scale) per image)."""
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+
+    mosaic = Image.new('RGB', (columns * tile_size, rows * tile_size))
+    tiles = []
+
+    for index, image in enumerate(images):
+        resized_image, scale = resize_to_fit(image, tile_size)
+
+        x = (index % columns) * tile_size
+        y = (index // columns) * tile_size
+
+        mosaic.paste(resized_image.convert('RGB'), (x, y))
+
+        tiles.append((x, y, scale))
+
+    return mosaic, tiles
+
+
+def split_mosaic_predictions(predictions, tiles, tile_size):
+    """Split the predictions of a mosaic by the tile containing the box center, boxes are mapped to the tile image."""
+    result = [[] for tile in tiles]
+
+    for prediction in predictions:
+        x_min, y_min, x_max, y_max = get_box(prediction)
+
+        x_center = (x_min + x_max) / 2
+        y_center = (y_min + y_max) / 2
+
+        for index, tile in enumerate(tiles):
+            x, y, scale = tile
+
+            if x <= x_center < x + tile_size and y <= y_center < y + tile_size:
+                tile_prediction = dict(prediction)
+
+                tile_prediction[X_MIN] = int((max(x_min, x) - x) * scale)
+                tile_prediction[Y_MIN] = int((max(y_min, y) - y) * scale)
+                tile_prediction[X_MAX] = int((min(x_max, x + tile_size) - x) * scale)
+                tile_prediction[Y_MAX] = int((min(y_max, y + tile_size) - y) * scale)
+
+                result[index].append(tile_prediction)
+
+                break
+
+    return result
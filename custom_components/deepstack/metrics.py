@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Rolling window of the latest samples of a single stage."""
+
+    def __init__(self, window_size=METRICS_WINDOW_SIZE):
+        self._samples = deque(maxlen=window_size)
+        self._count = 0
+        self._total = 0
+
+    def observe(self, value):
+        self._samples.append(value)
+        self._count += 1
+        self._total += value
+
+    @property
+    def samples(self):
+        return list(self._samples)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def total(self):
+        return self._total
+
+    def get_percentiles(self):
+        samples = sorted(self._samples)
+
+        result = {}
+
+        for name, quantile in METRICS_QUANTILES.items():
+            value = None
+
+            if len(samples) > 0:
+                index = min(int(math.ceil(quantile * len(samples))) - 1, len(samples) - 1)
+                value = round(samples[max(index, 0)], 4)
+
+            result[name] = value
+
+        return result
+
+
+class Metrics:
+    """Latency histograms per stage, camera and endpoint."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, camera_entity_id=None, endpoint=None):
+        key = (stage, camera_entity_id or '', endpoint or '')
+
+        with self._lock:
+            histogram = self._histograms.get(key)
+
+            if histogram is None:
+                histogram = LatencyHistogram()
+
+                self._histograms[key] = histogram
+
+            histogram.observe(seconds)
+
+    @contextmanager
+    def measure(self, stage, camera_entity_id=None, endpoint=None):
+        start_time = time.monotonic()
+
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start_time, camera_entity_id, endpoint)
+
+    def get_percentile(self, stage, name):
+        """Percentile of a stage across all cameras and endpoints."""
+        merged = LatencyHistogram()
+
+        with self._lock:
+            for key, histogram in self._histograms.items():
+                if key[0] == stage:
+                    for sample in histogram.samples:
+                        merged.observe(sample)
+
+        result = merged.get_percentiles().get(name)
+
+        return result
+
+    @property
+    def diagnostics(self):
+        """Percentiles grouped by stage, each stage lists its camera / endpoint combinations."""
+        result = {}
+
+        with self._lock:
+            for key in sorted(self._histograms.keys()):
+                stage, camera_entity_id, endpoint = key
+                histogram = self._histograms[key]
+
+                label = ' '.join([item for item in [camera_entity_id, endpoint] if item]) or ALL
+
+                stage_data = result.get(stage, {})
+
+                stage_data[label] = histogram.get_percentiles()
+                stage_data[label][COUNT] = histogram.count
+
+                result[stage] = stage_data
+
+        return result
+
+    def to_prometheus(self):
+        """Text exposition format, a summary with quantiles per stage, camera and endpoint."""
+        lines = [
+            f'# HELP {METRICS_NAME} Latency of the DeepStack processing stages in seconds',
+            f'# TYPE {METRICS_NAME} summary'
+        ]
+
+        with self._lock:
+            for key in sorted(self._histograms.keys()):
+                stage, camera_entity_id, endpoint = key
+                histogram = self._histograms[key]
+
+                labels = f'stage="{stage}",camera="{camera_entity_id}",endpoint="{endpoint}"'
+
+                for name, value in histogram.get_percentiles().items():
+                    if value is not None:
+                        quantile = METRICS_QUANTILES[name]
+
+                        lines.append(f'{METRICS_NAME}{{{labels},quantile="{quantile}"}} {value}')
+
+                lines.append(f'{METRICS_NAME}_sum{{{labels}}} {round(histogram.total, 4)}')
+                lines.append(f'{METRICS_NAME}_count{{{labels}}} {histogram.count}')
+
+        result = '\n'.join(lines) + '\n'
+
+        return result
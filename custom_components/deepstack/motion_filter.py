@@ -0,0 +1,81 @@
+import logging
+import threading
+
+from PIL import Image, ImageChops
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MotionFilter:
+    """Compares low resolution frames to a running background per camera to skip frames without motion."""
+
+    def __init__(self):
+        self._thresholds = {}
+        self._backgrounds = {}
+        self._last_results = {}
+        self._scores = {}
+        self._skips = {}
+        self._lock = threading.Lock()
+
+    def set_threshold(self, camera_entity_id, threshold):
+        self._thresholds[camera_entity_id] = threshold
+
+    def is_enabled(self, camera_entity_id):
+        return camera_entity_id in self._thresholds
+
+    def is_motion_detected(self, frame):
+        """Whether the changed pixels ratio of the frame is above the threshold of its camera."""
+        camera_entity_id = frame.camera_entity_id
+
+        if not self.is_enabled(camera_entity_id):
+            return True
+
+        result = True
+
+        try:
+            small_image = frame.image.convert('L').resize(MOTION_FRAME_SIZE)
+
+            with self._lock:
+                last_digest, last_result = self._last_results.get(camera_entity_id, (None, None))
+
+                if last_digest == frame.digest:
+                    return last_result
+
+                background = self._backgrounds.get(camera_entity_id)
+
+                if background is not None:
+                    difference = ImageChops.difference(small_image, background)
+                    histogram = difference.histogram()
+
+                    changed_pixels = sum(histogram[MOTION_PIXEL_THRESHOLD:])
+                    score = changed_pixels / (MOTION_FRAME_SIZE[0] * MOTION_FRAME_SIZE[1])
+
+                    result = score >= self._thresholds[camera_entity_id]
+
+                    self._scores[camera_entity_id] = round(score, 4)
+
+                    background = Image.blend(background, small_image, MOTION_BACKGROUND_ALPHA)
+                else:
+                    background = small_image
+
+                if not result:
+                    self._skips[camera_entity_id] = self._skips.get(camera_entity_id, 0) + 1
+
+                self._backgrounds[camera_entity_id] = background
+                self._last_results[camera_entity_id] = (frame.digest, result)
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to check motion of {camera_entity_id}, Error: {ex}')
+
+        return result
+
+    def get_statistics(self, camera_entity_id):
+        result = {}
+
+        if self.is_enabled(camera_entity_id):
+            result[ATTR_MOTION_SCORE] = self._scores.get(camera_entity_id)
+            result[ATTR_MOTION_SKIPS] = self._skips.get(camera_entity_id, 0)
+
+        return result
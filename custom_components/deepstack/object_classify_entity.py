@@ -7,9 +7,11 @@ https://home-assistant.io/components/image_processing.deepstack_object
 import logging
 
 from homeassistant.core import split_entity_id
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.components.image_processing import (ImageProcessingEntity)
 
 from .const import *
+from .frame_pipeline import Frame
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,14 +39,53 @@ class ObjectClassifyEntity(ImageProcessingEntity):
 
         self._state = None
         self._predictions = {}
+        self._is_active = False
 
-    def process_image(self, image):
-        """Process an image."""
-        _LOGGER.debug(f'Starting to detect objects in image of {self._name}')
-        response = self._data.detect(image, self._targets)
+    async def async_update(self):
+        """Scan only when the integration is ready and the adaptive scheduler allows it."""
+        if not self._data.is_ready or not self._data.is_scan_due(self._camera_entity_id, OPERATION_DETECT):
+            return
 
+        self._is_active = False
+
+        with self._data.metrics.measure(STAGE_TOTAL, self._camera_entity_id, OPERATION_DETECT):
+            frame = await self._data.async_get_frame(self._camera_entity_id, self._async_get_image)
+
+            if frame is not None:
+                await self.async_process_image(frame)
+
+        self._data.report_scan(self._camera_entity_id, OPERATION_DETECT, self._is_active)
+
+    async def _async_get_image(self):
+        camera = self.hass.components.camera
+
+        try:
+            with self._data.metrics.measure(STAGE_FETCH, self._camera_entity_id):
+                image = await camera.async_get_image(self.camera_entity, timeout=self.timeout)
+
+        except HomeAssistantError as err:
+            _LOGGER.error(f'Error on receive image from entity: {err}')
+
+            return None
+
+        return image.content
+
+    async def async_process_image(self, image):
+        """Process an image on the event loop."""
+        frame = Frame.create(image, self._camera_entity_id)
+
+        if not await self._data.async_is_motion_detected(frame, self._camera_entity_id):
+            return
+
+        _LOGGER.debug('Starting to detect objects in image of %s', self._name)
+        response = await self._data.async_detect(frame, self._camera_entity_id, self._targets)
+
+        self._update_result(response)
+
+    def _update_result(self, response):
         self._state = response.get(COUNT)
         self._predictions = response.get(TARGETS)
+        self._is_active = bool(self._state)
 
     @property
     def camera_entity(self):
@@ -66,7 +107,10 @@ class ObjectClassifyEntity(ImageProcessingEntity):
         """Return device specific state attributes."""
         attr = {
             CONF_TARGETS: self._targets,
-            PREDICTIONS: self._predictions
+            PREDICTIONS: self._predictions,
+            ATTR_CONNECTED: self._data.is_api_connected
         }
 
+        attr.update(self._data.get_statistics(self._camera_entity_id, OPERATION_DETECT))
+
         return attr
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+
+from homeassistant.components.image_processing import CONF_CONFIDENCE
+
+from . import image_utils
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Track:
+    """Person followed across frames with the identity of its face."""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.last_seen = now
+        self.last_recognized = None
+        self.scores = {}
+        self.face_offset = None
+
+    @property
+    def identity(self):
+        """Identity with the highest smoothed confidence, None before the face was recognized."""
+        if len(self.scores) == 0:
+            return None
+
+        result = max(self.scores, key=self.scores.get)
+
+        return result
+
+    @property
+    def confidence(self):
+        identity = self.identity
+
+        return 0 if identity is None else self.scores[identity]
+
+    def observe(self, user_id, confidence, face_box, now):
+        """Exponential smoothing of the confidence per identity, a single low / wrong match does not flip it.
+
+        The face box is kept relative to the person box, so it follows the person in the next frames.
+        """
+        for identity in self.scores:
+            self.scores[identity] *= 1 - TRACKING_SMOOTHING
+
+        self.scores[user_id] = self.scores.get(user_id, 0) + confidence * TRACKING_SMOOTHING
+
+        if len(self.scores) == 1:
+            self.scores[user_id] = max(self.scores[user_id], confidence)
+
+        self.face_offset = tuple(face_value - self.box[index % 2] for index, face_value in enumerate(face_box))
+        self.last_recognized = now
+
+    def to_person(self):
+        """Person box of the track, the region to recognize its face in."""
+        x_min, y_min, x_max, y_max = self.box
+
+        prediction = {
+            LABEL: TARGET_PERSON,
+            X_MIN: x_min,
+            Y_MIN: y_min,
+            X_MAX: x_max,
+            Y_MAX: y_max
+        }
+
+        return prediction
+
+    def to_prediction(self):
+        """Face of the track, at the last recognized face box moved along with the person box."""
+        x_min, y_min, x_max, y_max = [offset + self.box[index % 2] for index, offset in enumerate(self.face_offset)]
+
+        prediction = {
+            USER_ID: self.identity,
+            CONF_CONFIDENCE: self.confidence,
+            X_MIN: x_min,
+            Y_MIN: y_min,
+            X_MAX: x_max,
+            Y_MAX: y_max
+        }
+
+        return prediction
+
+
+class PersonTracker:
+    """Links the detected persons of a camera across frames by the overlap (IoU) of their boxes.
+
+    Faces are recognized once per new track, when the identity confidence of a track is below the confidence level
+    or every refresh_interval seconds, otherwise the identity of the track is carried forward.
+    Tracks not seen for max_age seconds are retired.
+    """
+
+    def __init__(self, enabled, iou_threshold=DEFAULT_TRACKING_IOU_THRESHOLD, max_age=DEFAULT_TRACKING_MAX_AGE,
+                 refresh_interval=DEFAULT_TRACKING_REFRESH_INTERVAL):
+        self._enabled = enabled
+        self._iou_threshold = iou_threshold
+        self._max_age = max_age
+        self._refresh_interval = refresh_interval
+        self._tracks = {}
+        self._tracked_recognitions = {}
+        self._next_track_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def update(self, camera_entity_id, persons):
+        """Match the persons of a frame to the camera tracks, returns the tracks of the persons."""
+        now = time.monotonic()
+
+        boxes = [image_utils.get_box(person) for person in persons]
+
+        with self._lock:
+            tracks = self._get_active_tracks(camera_entity_id, now)
+
+            pairs = []
+
+            for track_index, track in enumerate(tracks):
+                for box_index, box in enumerate(boxes):
+                    iou = image_utils.get_iou(track.box, box)
+
+                    if iou >= self._iou_threshold:
+                        pairs.append((iou, track_index, box_index))
+
+            pairs.sort(reverse=True)
+
+            matched_tracks = set()
+            box_tracks = {}
+
+            for iou, track_index, box_index in pairs:
+                if track_index in matched_tracks or box_index in box_tracks:
+                    continue
+
+                matched_tracks.add(track_index)
+                box_tracks[box_index] = tracks[track_index]
+
+            result = []
+
+            for box_index, box in enumerate(boxes):
+                track = box_tracks.get(box_index)
+
+                if track is None:
+                    track = Track(self._next_track_id, box, now)
+
+                    self._next_track_id += 1
+
+                    tracks.append(track)
+
+                    _LOGGER.debug('New track %d of %s', track.track_id, camera_entity_id)
+
+                track.box = box
+                track.last_seen = now
+
+                result.append(track)
+
+            self._tracks[camera_entity_id] = tracks
+
+        return result
+
+    def _get_active_tracks(self, camera_entity_id, now):
+        """Tracks of the camera seen within max_age seconds, the others are retired."""
+        result = [track for track in self._tracks.get(camera_entity_id, []) if now - track.last_seen < self._max_age]
+
+        return result
+
+    def get_pending(self, tracks, min_confidence):
+        """Tracks that need face recognition."""
+        now = time.monotonic()
+
+        result = [track for track in tracks
+                  if track.identity is None or track.confidence < min_confidence or
+                  now - track.last_recognized >= self._refresh_interval]
+
+        return result
+
+    def assign(self, tracks, predictions):
+        """Assign recognized faces to the tracks containing them, returns the faces outside of all the tracks."""
+        now = time.monotonic()
+
+        unassigned = []
+
+        with self._lock:
+            for prediction in predictions:
+                face_box = image_utils.get_box(prediction)
+
+                track = next((track for track in tracks if image_utils.is_center_inside(face_box, track.box)), None)
+
+                if track is None:
+                    unassigned.append(prediction)
+                else:
+                    track.observe(prediction.get(USER_ID), prediction.get(CONF_CONFIDENCE, 0), face_box, now)
+
+        return unassigned
+
+    def get_predictions(self, camera_entity_id, tracks, is_recognized):
+        """Predictions of the recognized tracks, counts the frames answered without face recognition."""
+        if not is_recognized:
+            with self._lock:
+                tracked_recognitions = self._tracked_recognitions.get(camera_entity_id, 0)
+
+                self._tracked_recognitions[camera_entity_id] = tracked_recognitions + 1
+
+        result = [track.to_prediction() for track in tracks if track.identity is not None]
+
+        return result
+
+    def get_statistics(self, camera_entity_id):
+        now = time.monotonic()
+
+        with self._lock:
+            tracks = self._get_active_tracks(camera_entity_id, now)
+
+            result = {
+                ATTR_TRACKS: len(tracks),
+                ATTR_TRACKED_RECOGNITIONS: self._tracked_recognitions.get(camera_entity_id, 0)
+            }
+
+        return result
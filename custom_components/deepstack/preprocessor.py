@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+from . import image_utils
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Preprocessor:
+    """Downscales and re-encodes images before upload, each operation has its own max dimension."""
+
+    def __init__(self, enabled, detection_max_size, recognition_max_size, quality):
+        self._enabled = enabled
+        self._max_sizes = {
+            OPERATION_DETECT: detection_max_size,
+            OPERATION_RECOGNIZE: recognition_max_size
+        }
+        self._quality = quality
+
+        self._frames = 0
+        self._original_bytes = 0
+        self._uploaded_bytes = 0
+        self._total_time = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def prepare(self, frame, operation):
+        """Content to upload for the frame and the scale to map the returned boxes back."""
+        if not self._enabled:
+            return frame.content, 1
+
+        content = frame.content
+        scale = 1
+
+        start_time = time.monotonic()
+
+        try:
+            resized_content, resized_scale = self.prepare_image(frame.image, operation)
+
+            if len(resized_content) < len(content):
+                content = resized_content
+                scale = resized_scale
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to preprocess frame of {frame.camera_entity_id}, Error: {ex}')
+
+        with self._lock:
+            self._frames += 1
+            self._original_bytes += len(frame.content)
+            self._uploaded_bytes += len(content)
+            self._total_time += time.monotonic() - start_time
+
+        return content, scale
+
+    def prepare_image(self, image, operation):
+        """Encode a decoded image (frame or crop), resized when preprocessing is enabled."""
+        scale = 1
+        quality = DEFAULT_JPEG_QUALITY
+
+        if self._enabled:
+            image, scale = image_utils.resize_to_fit(image, self._max_sizes.get(operation))
+            quality = self._quality
+
+        content = image_utils.encode(image, quality)
+
+        return content, scale
+
+    @property
+    def statistics(self):
+        result = {}
+
+        if self._enabled:
+            average_time = None
+
+            if self._frames > 0:
+                average_time = round(self._total_time / self._frames, 4)
+
+            result = {
+                ATTR_ORIGINAL_BYTES: self._original_bytes,
+                ATTR_UPLOADED_BYTES: self._uploaded_bytes,
+                ATTR_PREPROCESSING_TIME: average_time
+            }
+
+        return result
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+WAITER_GRANTED = 'granted'
+WAITER_DROPPED = 'dropped'
+
+
+class _Waiter:
+    def __init__(self, priority, sequence, key, notify):
+        self.priority = priority
+        self.sequence = sequence
+        self.key = key
+        self.notify = notify
+        self.state = None
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class RequestLimiter:
+    """Bounds the in-flight requests, queued requests are served by priority.
+
+    A queued request is dropped when a newer request with the same key (camera and operation) arrives,
+    it is also dropped when it waits longer than its timeout.
+    Works for both executor threads and the event loop, they share the same slots.
+    """
+
+    def __init__(self, max_in_flight):
+        self._max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+        self._max_queue_depth = 0
+        self._waits = 0
+        self._total_wait_time = 0
+        self._dropped = 0
+
+    def acquire(self, priority, key=None, timeout=None):
+        """Wait for a slot, returns False when the request was dropped."""
+        start_time = time.monotonic()
+        event = threading.Event()
+
+        waiter = self._enter(priority, key, event.set)
+
+        if waiter is not None:
+            event.wait(timeout)
+
+        result = self._resolve(waiter, start_time)
+
+        return result
+
+    async def async_acquire(self, priority, key=None, timeout=None):
+        start_time = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_future():
+            if not future.done():
+                future.set_result(True)
+
+        def notify():
+            loop.call_soon_threadsafe(set_future)
+
+        waiter = self._enter(priority, key, notify)
+
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+
+            except asyncio.TimeoutError:
+                pass
+
+            except asyncio.CancelledError:
+                if self._resolve(waiter, start_time):
+                    self.release()
+
+                raise
+
+        result = self._resolve(waiter, start_time)
+
+        return result
+
+    def release(self):
+        with self._lock:
+            if len(self._queue) > 0:
+                waiter = heapq.heappop(self._queue)
+                waiter.state = WAITER_GRANTED
+                waiter.notify()
+            else:
+                self._in_flight -= 1
+
+    def _enter(self, priority, key, notify):
+        """Take a slot when available and nothing is queued, otherwise queue a waiter and return it."""
+        with self._lock:
+            if self._in_flight < self._max_in_flight and len(self._queue) == 0:
+                self._in_flight += 1
+
+                return None
+
+            if key is not None:
+                stale_waiters = [waiter for waiter in self._queue if waiter.key == key]
+
+                for stale_waiter in stale_waiters:
+                    self._drop(stale_waiter)
+
+                    _LOGGER.debug('Dropped stale request of %s, newer frame arrived', key)
+
+            waiter = _Waiter(priority, next(self._sequence), key, notify)
+
+            heapq.heappush(self._queue, waiter)
+
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+
+            return waiter
+
+    def _drop(self, waiter):
+        self._queue.remove(waiter)
+        heapq.heapify(self._queue)
+
+        waiter.state = WAITER_DROPPED
+        waiter.notify()
+
+        self._dropped += 1
+
+    def _resolve(self, waiter, start_time):
+        with self._lock:
+            if waiter is not None and waiter.state is None:
+                self._drop(waiter)
+
+                _LOGGER.debug('Dropped request of %s, waited too long', waiter.key)
+
+            self._waits += 1
+            self._total_wait_time += time.monotonic() - start_time
+
+            result = waiter is None or waiter.state == WAITER_GRANTED
+
+        return result
+
+    @property
+    def statistics(self):
+        average_wait_time = 0
+
+        if self._waits > 0:
+            average_wait_time = round(self._total_wait_time / self._waits, 3)
+
+        result = {
+            ATTR_IN_FLIGHT: self._in_flight,
+            ATTR_QUEUE_DEPTH: len(self._queue),
+            ATTR_MAX_QUEUE_DEPTH: self._max_queue_depth,
+            ATTR_AVERAGE_WAIT_TIME: average_wait_time,
+            ATTR_DROPPED_REQUESTS: self._dropped
+        }
+
+        return result
@@ -0,0 +1,84 @@
+import logging
+import time
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ScanScheduler:
+    """Adapts the scan rate of each processor to its activity within a global requests budget."""
+
+    def __init__(self, enabled, max_interval, requests_per_second):
+        self._enabled = enabled
+        self._max_interval = max_interval
+        self._requests_per_second = requests_per_second
+        self._min_intervals = {}
+        self._intervals = {}
+        self._next_scans = {}
+        # A budget below one request per second still holds one request, otherwise no scan would ever be due
+        self._capacity = max(1.0, float(requests_per_second))
+        self._tokens = self._capacity
+        self._tokens_updated = time.monotonic()
+
+    def register(self, camera_entity_id, operation, min_interval):
+        key = (camera_entity_id, operation)
+
+        self._min_intervals[key] = min_interval
+        self._intervals[key] = min_interval
+        self._next_scans[key] = 0
+
+    def is_due(self, camera_entity_id, operation):
+        """Whether the processor should scan now, consumes a request from the budget when it is."""
+        key = (camera_entity_id, operation)
+
+        if not self._enabled or key not in self._intervals:
+            return True
+
+        now = time.monotonic()
+
+        if now < self._next_scans[key]:
+            return False
+
+        if self._requests_per_second > 0:
+            elapsed = now - self._tokens_updated
+
+            self._tokens = min(self._tokens + elapsed * self._requests_per_second, self._capacity)
+            self._tokens_updated = now
+
+            if self._tokens < 1:
+                _LOGGER.debug('Requests budget exhausted, delaying %s of %s', operation, camera_entity_id)
+
+                return False
+
+            self._tokens -= 1
+
+        return True
+
+    def report(self, camera_entity_id, operation, is_active):
+        """Scan faster after activity, back off while the camera is idle."""
+        key = (camera_entity_id, operation)
+
+        if not self._enabled or key not in self._intervals:
+            return
+
+        min_interval = self._min_intervals[key]
+
+        if is_active:
+            interval = min_interval
+        else:
+            interval = min(self._intervals[key] * SCAN_BACKOFF_FACTOR, max(self._max_interval, min_interval))
+
+        self._intervals[key] = interval
+        self._next_scans[key] = time.monotonic() + interval - SCAN_INTERVAL_TOLERANCE
+
+    def get_statistics(self, camera_entity_id, operation):
+        result = {}
+
+        interval = self._intervals.get((camera_entity_id, operation))
+
+        if self._enabled and interval is not None:
+            result[ATTR_SCAN_INTERVAL] = round(interval, 2)
+            result[ATTR_SCAN_RATE] = round(1 / interval, 3) if interval > 0 else None
+
+        return result
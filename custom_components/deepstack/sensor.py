@@ -0,0 +1,107 @@
+"""
+Sensors of the DeepStack integration.
+
+For more details about this platform, please refer to the documentation at
+https://github.com/elad-bar/ha-deepstack/blob/master/README.md
+"""
+import logging
+
+from homeassistant.helpers.entity import Entity
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+DEPENDENCIES = [DOMAIN]
+
+
+def setup_platform(hass, config, add_devices, discovery_info=None):
+    """Set up the DeepStack sensors."""
+    data = hass.data[DATA_DEEP_STACK]
+
+    sensors = [
+        CircuitBreakerSensor(data),
+        DiagnosticsSensor(data),
+        FacesSensor(data)
+    ]
+
+    add_devices(sensors)
+
+
+class CircuitBreakerSensor(Entity):
+    """State of the circuit breaker in front of the DeepStack API."""
+
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return DEEP_STACK_CIRCUIT_BREAKER
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self._data.circuit_breaker.state
+
+    @property
+    def device_state_attributes(self):
+        """Return the circuit breaker counters."""
+        attrs = self._data.circuit_breaker.statistics
+
+        return attrs
+
+
+class DiagnosticsSensor(Entity):
+    """Latency percentiles of the processing stages, the state is the p95 of a full scan."""
+
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return DEEP_STACK_DIAGNOSTICS
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self._data.metrics.get_percentile(STAGE_TOTAL, 'p95')
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return TIME_SECONDS
+
+    @property
+    def device_state_attributes(self):
+        """Return the latency percentiles per stage, camera and endpoint."""
+        attrs = self._data.metrics.diagnostics
+
+        attrs.update(self._data.readiness)
+
+        return attrs
+
+
+class FacesSensor(Entity):
+    """Registered faces from the face catalog, the state is the number of faces."""
+
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return DEEP_STACK_FACES
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return len(self._data.face_catalog.faces)
+
+    @property
+    def device_state_attributes(self):
+        """Return the faces and when the catalog was last updated."""
+        attrs = self._data.face_catalog.statistics
+
+        return attrs
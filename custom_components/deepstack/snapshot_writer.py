@@ -0,0 +1,264 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from collections import deque
+from datetime import datetime
+from homeassistant.util import slugify
+
+from . import image_utils
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+DAY = 24 * 60 * 60
+
+# <camera slug>_<SNAPSHOT_DATE_FORMAT>[_<face index>].jpg, other files of the directory are never removed
+SNAPSHOT_FILE_NAME = re.compile(r'^[a-z0-9_]+_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}-\d{6}(_\d+)?' +
+                                re.escape(SNAPSHOT_EXTENSION) + '$')
+
+
+class SnapshotWriter:
+    """Stores the unknown faces snapshots on a background thread, off the recognition path.
+
+    Near identical consecutive snapshots of a camera are stored once, the oldest snapshots are removed
+    once there are more than max_files, more than max_size megabytes or older than max_age days.
+    Only the snapshots named by the writer are counted and removed.
+    """
+
+    def __init__(self, directory, enabled, crop_faces=False, queue_size=DEFAULT_SNAPSHOT_QUEUE_SIZE,
+                 dedupe_threshold=DEFAULT_SNAPSHOT_DEDUPE_THRESHOLD, max_files=DEFAULT_SNAPSHOT_MAX_FILES,
+                 max_size=DEFAULT_SNAPSHOT_MAX_SIZE, max_age=DEFAULT_SNAPSHOT_MAX_AGE):
+        self._directory = directory
+        self._enabled = enabled
+        self._crop_faces = crop_faces
+        self._dedupe_threshold = dedupe_threshold
+        self._max_files = max_files
+        self._max_bytes = max_size * MEGABYTE
+        self._max_age = max_age * DAY
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = deque()
+        self._bytes = 0
+        self._last_snapshots = {}
+        self._thread = None
+        self._written = 0
+        self._dropped = 0
+        self._deduplicated = 0
+        self._removed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def start(self):
+        if not self._enabled or self._thread is not None:
+            return
+
+        self._load_files()
+
+        self._thread = threading.Thread(target=self._run, name=f'{DOMAIN}_snapshot_writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, event=None):
+        """Write the queued snapshots and stop the writer."""
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join()
+
+        self._thread = None
+
+    def enqueue(self, frame, predictions=None, on_written=None):
+        """Queue a snapshot of the frame, on_written is called with its path once the file exists.
+
+        on_written is called on the writer thread, with the path of the previous snapshot when the frame is a near
+        duplicate of it, with None when the snapshot is not stored (disabled, queue full or write failure).
+        """
+        if not self._enabled:
+            self._notify(on_written, None)
+
+            return
+
+        camera_entity_id = frame.camera_entity_id
+        perceptual_hash = self._get_perceptual_hash(frame)
+
+        last_snapshot = self._last_snapshots.get(camera_entity_id)
+
+        if last_snapshot is not None and perceptual_hash is not None:
+            last_perceptual_hash, last_file_path = last_snapshot
+
+            distance = image_utils.get_hash_distance(perceptual_hash, last_perceptual_hash)
+
+            if distance <= self._dedupe_threshold:
+                with self._lock:
+                    self._deduplicated += 1
+
+                # Queued as well, the previous snapshot may not be written yet
+                self._put(None, None, last_file_path, on_written)
+
+                return
+
+        current_time = datetime.now().strftime(SNAPSHOT_DATE_FORMAT)
+        base_file_path = os.path.join(self._directory, f'{slugify(camera_entity_id)}_{current_time}')
+
+        if not self._put(frame, predictions, base_file_path, on_written):
+            return
+
+        file_path = f'{base_file_path}{SNAPSHOT_EXTENSION}'
+
+        if perceptual_hash is not None:
+            self._last_snapshots[camera_entity_id] = (perceptual_hash, file_path)
+
+    def _put(self, frame, predictions, file_path, on_written):
+        """Queue an item, a frame of None only calls on_written with the path once the previous items are done."""
+        try:
+            self._queue.put_nowait((frame, predictions, file_path, on_written))
+
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+            _LOGGER.warning(f'Snapshots queue is full, dropping the snapshot of {file_path}')
+
+            self._notify(on_written, None)
+
+            return False
+
+        return True
+
+    @staticmethod
+    def _notify(on_written, file_path):
+        if on_written is None:
+            return
+
+        try:
+            on_written(file_path)
+        except Exception as ex:
+            _LOGGER.error(f'Failed to notify the snapshot: {file_path}, Error: {ex}')
+
+    def _get_perceptual_hash(self, frame):
+        """Perceptual hash for the duplicates check, None when it is disabled or the frame cannot be decoded."""
+        if self._dedupe_threshold == 0:
+            return None
+
+        try:
+            return frame.perceptual_hash
+        except Exception as ex:
+            _LOGGER.debug(f'Failed to hash the snapshot of {frame.camera_entity_id}, Error: {ex}')
+
+        return None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+
+            if item is None:
+                break
+
+            frame, predictions, file_path, on_written = item
+
+            if frame is not None:
+                try:
+                    file_path = self._write(frame, predictions, file_path)
+                except Exception as ex:
+                    _LOGGER.error(f'Failed to store snapshot: {file_path}, Error: {ex}')
+
+                    file_path = None
+
+            self._notify(on_written, file_path)
+
+        _LOGGER.debug('Snapshot writer stopped')
+
+    def _write(self, frame, predictions, base_file_path):
+        """Store the snapshot (or its cropped faces), returns the path of the first file."""
+        contents = [frame.content]
+
+        if self._crop_faces and predictions:
+            regions = image_utils.crop_regions(frame.image, predictions, SNAPSHOT_FACE_PADDING)
+
+            contents = [image_utils.encode(region_image) for region_image, x_offset, y_offset in regions]
+
+        for index, content in enumerate(contents):
+            suffix = '' if index == 0 else f'_{index}'
+            file_path = f'{base_file_path}{suffix}{SNAPSHOT_EXTENSION}'
+
+            with open(file_path, 'wb') as snapshot_file:
+                snapshot_file.write(content)
+
+            self._files.append((file_path, len(content), time.time()))
+            self._bytes += len(content)
+
+            with self._lock:
+                self._written += 1
+
+        self._apply_retention()
+
+        result = f'{base_file_path}{SNAPSHOT_EXTENSION}'
+
+        return result
+
+    def _load_files(self):
+        """Snapshots stored before the restart, oldest first."""
+        files = []
+
+        try:
+            for entry in os.scandir(self._directory):
+                if entry.is_file() and SNAPSHOT_FILE_NAME.match(entry.name) is not None:
+                    stat = entry.stat()
+
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+
+        except Exception as ex:
+            _LOGGER.warning(f'Failed to list snapshots of {self._directory}, Error: {ex}')
+
+        files.sort(key=lambda item: item[2])
+
+        self._files = deque(files)
+        self._bytes = sum(item[1] for item in files)
+
+        self._apply_retention()
+
+    def _apply_retention(self):
+        expiry_time = time.time() - self._max_age
+
+        while len(self._files) > 0:
+            file_path, size, created_at = self._files[0]
+
+            is_expired = len(self._files) > self._max_files or self._bytes > self._max_bytes or \
+                created_at < expiry_time
+
+            if not is_expired:
+                break
+
+            self._files.popleft()
+            self._bytes -= size
+
+            try:
+                os.remove(file_path)
+
+                with self._lock:
+                    self._removed += 1
+
+            except FileNotFoundError:
+                pass
+            except Exception as ex:
+                _LOGGER.warning(f'Failed to remove snapshot: {file_path}, Error: {ex}')
+
+    @property
+    def statistics(self):
+        with self._lock:
+            result = {
+                ATTR_SNAPSHOT_QUEUE_DEPTH: self._queue.qsize(),
+                ATTR_SNAPSHOTS_WRITTEN: self._written,
+                ATTR_SNAPSHOTS_DROPPED: self._dropped,
+                ATTR_SNAPSHOTS_DEDUPLICATED: self._deduplicated,
+                ATTR_SNAPSHOTS_REMOVED: self._removed
+            }
+
+        return result
@@ -0,0 +1,140 @@
+import logging
+import threading
+
+import numpy as np
+
+from homeassistant.components.image_processing import CONF_CONFIDENCE
+
+from .const import *
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Zone:
+    """Polygon in frame coordinates, the edges are precomputed for the point in polygon test."""
+
+    def __init__(self, points):
+        x = np.array([point[0] for point in points], dtype=float)
+        y = np.array([point[1] for point in points], dtype=float)
+
+        next_x = np.roll(x, -1)
+        next_y = np.roll(y, -1)
+
+        self._x = x
+        self._y = y
+        self._next_y = next_y
+
+        # Inverse slope of each edge, horizontal edges are never crossed so their value does not matter
+        delta_y = next_y - y
+        self._inverse_slope = (next_x - x) / np.where(delta_y == 0, 1, delta_y)
+
+        self._box = (int(x.min()), int(y.min()), int(np.ceil(x.max())), int(np.ceil(y.max())))
+
+    @property
+    def box(self):
+        return self._box
+
+    def contains(self, points_x, points_y):
+        """Even-odd ray casting of all the points against all the edges, returns a boolean per point."""
+        points_x = points_x[:, np.newaxis]
+        points_y = points_y[:, np.newaxis]
+
+        is_spanning = (self._y > points_y) != (self._next_y > points_y)
+        crossing_x = self._x + (points_y - self._y) * self._inverse_slope
+
+        crossings = np.count_nonzero(is_spanning & (points_x < crossing_x), axis=1)
+
+        result = crossings % 2 == 1
+
+        return result
+
+
+class ZoneFilter:
+    """Keeps the detected objects of a camera within its zones and above the minimum confidence / area of the target.
+
+    An object is in a zone when the bottom center of its box (where it touches the ground) is inside the polygon.
+    """
+
+    def __init__(self):
+        self._zones = {}
+        self._target_filters = {}
+        self._crop_to_zones = {}
+        self._filtered = {}
+        self._lock = threading.Lock()
+
+    def set_filters(self, camera_entity_id, zones, target_filters, crop_to_zones=False):
+        self._zones[camera_entity_id] = [Zone(points) for points in zones]
+        self._target_filters[camera_entity_id] = target_filters
+        self._crop_to_zones[camera_entity_id] = crop_to_zones and len(zones) > 0
+
+    def is_enabled(self, camera_entity_id):
+        zones = self._zones.get(camera_entity_id, [])
+        target_filters = self._target_filters.get(camera_entity_id, {})
+
+        result = len(zones) > 0 or len(target_filters) > 0
+
+        return result
+
+    def get_crop_box(self, camera_entity_id):
+        """Bounding rectangle of all the zones of the camera when the frames should be cropped to it."""
+        if not self._crop_to_zones.get(camera_entity_id, False):
+            return None
+
+        boxes = [zone.box for zone in self._zones[camera_entity_id]]
+
+        result = (max(min(box[0] for box in boxes), 0), max(min(box[1] for box in boxes), 0),
+                  max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+        return result
+
+    def filter(self, camera_entity_id, predictions):
+        if predictions is None or len(predictions) == 0 or not self.is_enabled(camera_entity_id):
+            return predictions
+
+        target_filters = self._target_filters.get(camera_entity_id, {})
+        zones = self._zones.get(camera_entity_id, [])
+
+        boxes = np.array([[prediction.get(X_MIN, 0), prediction.get(Y_MIN, 0),
+                           prediction.get(X_MAX, 0), prediction.get(Y_MAX, 0)] for prediction in predictions],
+                         dtype=float)
+
+        confidences = np.array([prediction.get(CONF_CONFIDENCE, 0) for prediction in predictions], dtype=float)
+
+        labels = [prediction.get(LABEL) for prediction in predictions]
+
+        min_confidences = np.array([target_filters.get(label, {}).get(CONF_MIN_CONFIDENCE, DEFAULT_MIN_CONFIDENCE)
+                                    for label in labels], dtype=float)
+        min_areas = np.array([target_filters.get(label, {}).get(CONF_MIN_AREA, DEFAULT_MIN_AREA)
+                              for label in labels], dtype=float)
+
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        is_valid = (confidences >= min_confidences) & (areas >= min_areas)
+
+        if len(zones) > 0:
+            points_x = (boxes[:, 0] + boxes[:, 2]) / 2
+            points_y = boxes[:, 3]
+
+            is_in_zone = np.zeros(len(predictions), dtype=bool)
+
+            for zone in zones:
+                is_in_zone |= zone.contains(points_x, points_y)
+
+            is_valid &= is_in_zone
+
+        result = [prediction for prediction, is_prediction_valid in zip(predictions, is_valid) if is_prediction_valid]
+
+        with self._lock:
+            filtered = len(predictions) - len(result)
+
+            self._filtered[camera_entity_id] = self._filtered.get(camera_entity_id, 0) + filtered
+
+        return result
+
+    def get_statistics(self, camera_entity_id):
+        result = {}
+
+        if self.is_enabled(camera_entity_id):
+            result[ATTR_FILTERED_OBJECTS] = self._filtered.get(camera_entity_id, 0)
+
+        return result
@@ -0,0 +1,106 @@
+"""Tests of the DeepStack request flow with a stand-in Home Assistant and a fake DeepStack API."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('homeassistant')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_components.deepstack.const import (EVENT_DETECT_OBJECT, TARGET_PERSON,  # noqa: E402
+                                               LABEL, X_MIN, Y_MIN, X_MAX, Y_MAX)
+from custom_components.deepstack.deep_stack import DeepStack  # noqa: E402
+
+CAMERA_ENTITY_ID = 'camera.front'
+
+PERSON = {
+    LABEL: TARGET_PERSON,
+    'confidence': 0.9,
+    X_MIN: 10,
+    Y_MIN: 10,
+    X_MAX: 100,
+    Y_MAX: 200
+}
+
+
+class FakeConfig:
+    def __init__(self, config_dir):
+        self._config_dir = config_dir
+
+    def path(self, *path):
+        return os.path.join(self._config_dir, *path)
+
+    def is_allowed_path(self, path):
+        return True
+
+
+class FakeServices:
+    def register(self, domain, service, service_func, schema=None):
+        pass
+
+
+class FakeBus:
+    def __init__(self):
+        self.events = []
+
+    def async_fire(self, event_type, event_data=None):
+        self.events.append(event_type)
+
+    def async_listen_once(self, event_type, listener):
+        pass
+
+
+class FakeHass:
+    def __init__(self, config_dir):
+        self.config = FakeConfig(config_dir)
+        self.services = FakeServices()
+        self.bus = FakeBus()
+        self.data = {}
+
+    def async_add_job(self, target, *args):
+        return target(*args)
+
+    async def async_add_executor_job(self, target, *args):
+        return target(*args)
+
+
+@pytest.fixture
+def hass(tmp_path):
+    return FakeHass(str(tmp_path))
+
+
+@pytest.fixture
+def data(hass):
+    deep_stack = DeepStack(hass, {'host': '127.0.0.1', 'port': 5000})
+    deep_stack.api_calls = []
+
+    async def async_detect(image, camera_entity_id=None, is_droppable=True):
+        deep_stack.api_calls.append('detect')
+
+        return [dict(PERSON)]
+
+    async def async_recognize(image, camera_entity_id=None, is_droppable=True):
+        deep_stack.api_calls.append('recognize')
+
+        return []
+
+    deep_stack._api.async_detect = async_detect
+    deep_stack._api.async_recognize = async_recognize
+
+    return deep_stack
+
+
+def test_detect_fires_object_event(hass, data):
+    result = asyncio.run(data.async_detect(b'frame', CAMERA_ENTITY_ID, [TARGET_PERSON]))
+
+    assert result['count'] == 1
+    assert hass.bus.events.count(EVENT_DETECT_OBJECT) == 1
+
+
+def test_recognize_person_check_fires_no_object_event(hass, data):
+    asyncio.run(data.async_recognize(b'frame', CAMERA_ENTITY_ID, 'Front', True))
+
+    assert data.api_calls == ['detect', 'recognize']
+    assert EVENT_DETECT_OBJECT not in hass.bus.events
@@ -0,0 +1,91 @@
+"""Tests of the scan scheduler requests budget, loaded without the package (its __init__ imports homeassistant)."""
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+COMPONENT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'custom_components', 'deepstack')
+
+
+def load_scan_scheduler():
+    package = types.ModuleType('deepstack_standalone')
+    package.__path__ = [COMPONENT_PATH]
+    sys.modules[package.__name__] = package
+
+    spec = importlib.util.spec_from_file_location(f'{package.__name__}.scan_scheduler',
+                                                  os.path.join(COMPONENT_PATH, 'scan_scheduler.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+
+    return module
+
+
+scan_scheduler = load_scan_scheduler()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+
+    monkeypatch.setattr(scan_scheduler.time, 'monotonic', fake_clock)
+
+    return fake_clock
+
+
+def create_scheduler(requests_per_second):
+    scheduler = scan_scheduler.ScanScheduler(True, 60, requests_per_second)
+    scheduler.register('camera.front', 'detect', 0)
+
+    return scheduler
+
+
+@pytest.mark.parametrize('requests_per_second', [0.2, 0.5, 0.9])
+def test_fractional_budget_allows_scans(clock, requests_per_second):
+    scheduler = create_scheduler(requests_per_second)
+
+    assert scheduler.is_due('camera.front', 'detect')
+    assert not scheduler.is_due('camera.front', 'detect')
+
+    clock.now += 1 / requests_per_second + 0.001
+
+    assert scheduler.is_due('camera.front', 'detect')
+
+
+def test_fractional_budget_rate(clock):
+    scheduler = create_scheduler(0.5)
+
+    scans = 0
+
+    for second in range(20):
+        if scheduler.is_due('camera.front', 'detect'):
+            scans += 1
+
+        clock.now += 1
+
+    assert scans == 10
+
+
+def test_budget_holds_requests_per_second(clock):
+    scheduler = create_scheduler(3)
+
+    results = [scheduler.is_due('camera.front', 'detect') for index in range(4)]
+
+    assert results == [True, True, True, False]
+
+
+def test_disabled_budget(clock):
+    scheduler = create_scheduler(0)
+
+    assert all(scheduler.is_due('camera.front', 'detect') for index in range(10))